@@ -3,12 +3,7 @@ print("📊 UNIVARIATE ANALYSIS: MONTHLY ENROLLMENT TREND")
 print("="*60)
 
 # Monthly aggregation
-monthly_enrol = enrol.groupby('year_month').agg({
-    'total_enrol': 'sum',
-    'age_0_5': 'sum',
-    'age_5_17': 'sum',
-    'age_18_greater': 'sum'
-}).sort_index()
+monthly_enrol = grouping_level(enrol_levels, 'month', ['total_enrol', 'age_0_5', 'age_5_17', 'age_18_greater']).sort_index()
 
 print("\n📅 MONTHLY ENROLLMENT DATA:")
 display(monthly_enrol)
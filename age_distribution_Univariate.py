@@ -4,9 +4,9 @@ print("="*60)
 
 # Calculate total by age group
 age_totals = {
-    'Age 0-5': enrol['age_0_5'].sum(),
-    'Age 5-17': enrol['age_5_17'].sum(),
-    'Age 18+': enrol['age_18_greater'].sum()
+    'Age 0-5': enrol_cube['age_0_5'].sum(),
+    'Age 5-17': enrol_cube['age_5_17'].sum(),
+    'Age 18+': enrol_cube['age_18_greater'].sum()
 }
 
 total = sum(age_totals.values())
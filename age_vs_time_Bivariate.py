@@ -2,9 +2,11 @@ print("="*60)
 print("📊 BIVARIATE ANALYSIS: AGE DISTRIBUTION OVER TIME")
 print("="*60)
 
-# Calculate age percentages by month
-month_age = enrol.groupby('year_month')[['age_0_5', 'age_5_17', 'age_18_greater']].sum()
-month_age_pct = month_age.div(month_age.sum(axis=1), axis=0) * 100
+# Age percentages by month, from the aggregates (features.py)
+monthly = aggregates['year_month'][aggregates['year_month']['enrol_rows'] > 0].sort_index()
+month_age_pct = monthly[['child_pct', 'youth_pct', 'adult_pct']].rename(columns={
+    'child_pct': 'age_0_5', 'youth_pct': 'age_5_17', 'adult_pct': 'age_18_greater',
+})
 
 print("\n📊 AGE PERCENTAGE BY MONTH:")
 display(month_age_pct.round(2))
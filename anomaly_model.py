@@ -0,0 +1,207 @@
+"""Persisted anomaly model and chunked, parallel scoring of new extracts.
+
+ML_analysis.py fits the StandardScaler + IsolationForest once and saves
+them as a versioned artifact:
+
+    save_model(scaler, iso, feature_cols, contamination=0.005)
+
+New extracts are then scored without retraining, from Python or the shell:
+
+    from anomaly_model import load_model, score_frame
+    scored = score_frame(load_model(), df)
+
+    python anomaly_model.py "aadhar enrollment 4.csv"
+
+Each artifact is named after a digest of its contents
+(anomaly-<version>.joblib); latest.json points at the one saved last, and
+any earlier version can still be loaded by name. Extracts are read
+SCORE_CHUNK_SIZE rows at a time and the chunks are scored across a
+process pool with only a few chunks in flight, so memory stays flat
+whatever the extract size and scoring scales with the workers. Every row
+gets isolation_score (IsolationForest.score_samples, lower = more
+anomalous) and anomaly_score (-1 anomaly / 1 normal, as in
+ML_analysis.py). Rows are scored as read; they are not cleaned first.
+Scored extracts are written to SCORED_DIR as <extract>.scored.csv, out of
+the way of the extract patterns of data_loading.py (which also skip that
+suffix wherever the files are written).
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+from feature_registry import FEATURES, ensure_features
+
+MODEL_DIR = os.path.join('cache', 'models')
+SCORED_DIR = os.path.join('cache', 'scored')
+SCORED_SUFFIX = '.scored.csv'
+SCORE_CHUNK_SIZE = 250_000
+# Parallel scoring (None = one worker per core)
+SCORE_WORKERS = None
+
+
+def model_path(version, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, f'anomaly-{version}.joblib')
+
+
+def save_model(scaler, forest, feature_cols, contamination, model_dir=MODEL_DIR, dataset='enrol'):
+    """Save the fitted scaler and forest; returns the artifact's version.
+
+    The forest's offset_ is the anomaly cut-off, as in forest.predict.
+    """
+    model = {
+        'scaler': scaler,
+        'forest': forest,
+        'feature_cols': list(feature_cols),
+        'dataset': dataset,
+        'contamination': contamination,
+        'offset': float(forest.offset_),
+        'sklearn_version': sklearn.__version__,
+    }
+    os.makedirs(model_dir, exist_ok=True)
+    tmp_path = os.path.join(model_dir, 'anomaly.joblib.tmp')
+    joblib.dump(model, tmp_path)
+    h = hashlib.blake2b(digest_size=8)
+    with open(tmp_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    version = h.hexdigest()
+    os.replace(tmp_path, model_path(version, model_dir))
+
+    latest = os.path.join(model_dir, 'latest.json')
+    with open(latest + '.tmp', 'w') as f:
+        json.dump({'version': version, 'saved': time.strftime('%Y-%m-%dT%H:%M:%S')}, f, indent=2)
+    os.replace(latest + '.tmp', latest)
+    return version
+
+
+def load_model(version=None, model_dir=MODEL_DIR):
+    """The artifact of `version`, or the latest one saved"""
+    if version is None:
+        with open(os.path.join(model_dir, 'latest.json')) as f:
+            version = json.load(f)['version']
+    model = joblib.load(model_path(version, model_dir))
+    if model['sklearn_version'] != sklearn.__version__:
+        warnings.warn(f"Anomaly model {version} was saved with scikit-learn {model['sklearn_version']}, "
+                      f"loaded with {sklearn.__version__}")
+    model['version'] = version
+    return model
+
+
+def base_columns(model):
+    """Raw columns the model's features are computed from"""
+    registry = FEATURES[model['dataset']]
+    columns = set()
+
+    def collect(name):
+        if name in registry:
+            for dep in registry[name]['inputs']:
+                collect(dep)
+        else:
+            columns.add(name)
+
+    for name in model['feature_cols']:
+        collect(name)
+    return sorted(columns)
+
+
+def score_frame(model, df):
+    """df with isolation_score and anomaly_score columns added"""
+    df = df.copy()
+    # Missing counts are 0, as in the cleaned data the model was fit on
+    counts = [col for col in base_columns(model) if col in df.columns]
+    df[counts] = df[counts].fillna(0)
+    ensure_features(df, model['dataset'], model['feature_cols'])
+    X = model['scaler'].transform(df[model['feature_cols']].fillna(0))
+    scores = model['forest'].score_samples(X)
+    df['isolation_score'] = scores
+    # Same cut-off as forest.predict, without scoring twice
+    df['anomaly_score'] = np.where(scores < model['offset'], -1, 1).astype('int8')
+    return df
+
+
+# Model of each scoring worker, loaded once per process
+_worker_model = None
+
+
+def init_worker(version, model_dir):
+    global _worker_model
+    _worker_model = load_model(version, model_dir)
+    # The workers are the parallelism; no extra threads per worker
+    _worker_model['forest'].set_params(n_jobs=1)
+
+
+def score_worker_chunk(chunk):
+    return score_frame(_worker_model, chunk)
+
+
+def score_chunks(chunks, version, model_dir=MODEL_DIR, workers=SCORE_WORKERS):
+    """Scored chunks, in order, with at most two chunks per worker in flight"""
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(version, model_dir)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(score_worker_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def scored_path(path, out_dir=SCORED_DIR):
+    return os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + SCORED_SUFFIX)
+
+
+def score_file(path, out_path, version=None, model_dir=MODEL_DIR, chunk_size=SCORE_CHUNK_SIZE,
+               workers=SCORE_WORKERS):
+    """Score one CSV extract into out_path; returns (rows, anomalies)"""
+    if version is None:
+        # Pin the version, so every worker scores with the same model
+        version = load_model(model_dir=model_dir)['version']
+    rows = anomalies = 0
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    tmp_path = out_path + '.tmp'
+    chunks = pd.read_csv(path, chunksize=chunk_size)
+    for i, scored in enumerate(score_chunks(chunks, version, model_dir, workers)):
+        scored.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        rows += len(scored)
+        anomalies += int((scored['anomaly_score'] == -1).sum())
+    if rows == 0:
+        pd.DataFrame().to_csv(tmp_path, index=False)
+    os.replace(tmp_path, out_path)
+    return rows, anomalies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score CSV extracts with the saved anomaly model")
+    parser.add_argument('files', nargs='+', help="CSV extracts to score")
+    parser.add_argument('--out-dir', default=SCORED_DIR, help="where <extract>.scored.csv files are written")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--version', help="model version (default: the latest saved)")
+    parser.add_argument('--chunk-size', type=int, default=SCORE_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=SCORE_WORKERS, help="default: one per core")
+    args = parser.parse_args(argv)
+
+    version = args.version or load_model(model_dir=args.model_dir)['version']
+    print(f"Anomaly model {version}", file=sys.stderr)
+    for path in args.files:
+        start = time.perf_counter()
+        out_path = scored_path(path, args.out_dir)
+        rows, anomalies = score_file(path, out_path, version, args.model_dir, args.chunk_size, args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"{path}: {rows:,} rows, {anomalies:,} anomalies -> {out_path} ({elapsed:.1f} s)",
+              file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
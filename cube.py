@@ -0,0 +1,280 @@
+"""Pre-aggregated (state, district, pincode, month) cube of each dataset.
+
+The age-bucket counts of enrol/demo/bio are additive, so every report
+that sums them (state, district and monthly totals, age mixes, the
+cross-dataset integrity ratios) is answered by rolling up the cube
+instead of grouping the raw rows again:
+
+    state_enrol = rollup(enrol_cube, 'state', ['total_enrol', 'age_0_5'])
+
+A cube has one row per (state, district, pincode, month_key) with data,
+orders of magnitude fewer than the cleaned rows. features.py builds one
+per dataset in a single pass and persists it next to the shared tables,
+so other processes can load it with load_cube.
+
+Cubes are additive: the cube of newly ingested rows (a delta; negative
+for rows taken out) is merged into the stored one with apply_delta, and
+the per-level aggregates with their ratios are refreshed only for the
+keys the delta touches (refresh_aggregates).
+"""
+import os
+import json
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from feature_registry import ensure_features
+from shared_store import write_shared_table, open_shared_table, SHARED_DIR
+
+CUBE_KEYS = ['state', 'district', 'pincode', 'month_key']
+CUBE_MEASURES = {
+    'enrol': ['age_0_5', 'age_5_17', 'age_18_greater'],
+    'demo': ['demo_age_5_17', 'demo_age_17_'],
+    'bio': ['bio_age_5_17', 'bio_age_17_'],
+}
+CUBE_TOTALS = {'enrol': 'total_enrol', 'demo': 'total_demo', 'bio': 'total_bio'}
+# Sums are kept in 64 bits, whatever the dtype of the raw counts
+MEASURE_DTYPE = 'int64'
+
+
+def build_cube(df, dataset):
+    """Sum the counts of cleaned rows (or of other cubes) per cube key.
+
+    `rows` counts the raw rows behind each cell, so a cell whose rows are
+    all taken out again by a delta can be dropped.
+    """
+    measures = CUBE_MEASURES[dataset]
+    grouped = df.groupby(CUBE_KEYS, observed=True)
+    cube = grouped[measures].sum()
+    cube['rows'] = grouped['rows'].sum() if 'rows' in df.columns else grouped.size()
+    cube = cube.astype(MEASURE_DTYPE).reset_index()
+    return ensure_features(cube, dataset, [CUBE_TOTALS[dataset], 'year_month'])
+
+
+def merge_cubes(cubes, dataset):
+    """One cube from several (of chunks, extracts, deltas) with summed counts"""
+    cubes = [cube for cube in cubes if cube is not None]
+    for col in ('state', 'district'):
+        categories = union_categoricals([cube[col] for cube in cubes], sort_categories=True).categories
+        cubes = [cube.assign(**{col: cube[col].cat.set_categories(categories)}) for cube in cubes]
+    return build_cube(pd.concat(cubes, ignore_index=True), dataset)
+
+
+def negate_cube(cube):
+    """Delta that takes the rows of `cube` out again"""
+    cube = cube.copy()
+    measures = measure_columns(cube)
+    cube[measures] = -cube[measures]
+    return cube
+
+
+def apply_delta(cube, delta, dataset):
+    """Merge a delta cube into `cube`, dropping cells left without rows"""
+    if delta is None:
+        return cube
+    cube = merge_cubes([cube, delta], dataset)
+    return cube[cube['rows'] != 0].reset_index(drop=True)
+
+
+def measure_columns(cube):
+    """The additive columns of a cube (counts, totals and rows)"""
+    return [col for col in cube.columns if col not in CUBE_KEYS and cube[col].dtype.kind in 'iu']
+
+
+def rollup(cube, by, measures=None):
+    """Sums of `measures` (default: all of them) per `by`, like df.groupby(by)[measures].sum()"""
+    if measures is None:
+        measures = measure_columns(cube)
+    return cube.groupby(by, observed=True)[measures].sum()
+
+
+# Levels the reports read, rolled up from a cube in one pass by grouping_sets
+REPORT_LEVELS = {
+    'state': ['state'],
+    'district': ['state', 'district'],
+    'month': ['year_month'],
+    'state_month': ['state', 'year_month'],
+    'district_month': ['state', 'district', 'year_month'],
+}
+
+
+def grouping_sets(df, sets=REPORT_LEVELS, measures=None):
+    """Sums of `measures` for every grouping set in {name: keys}, as one tidy table.
+
+    df (a cube, or raw rows) is grouped once at the finest grain, the union
+    of all keys; every set is then rolled up from that much smaller result.
+    Rows carry their set's name in `level`; keys not in the set are missing.
+    """
+    keys = list(dict.fromkeys(key for by in sets.values() for key in by))
+    if measures is None:
+        measures = measure_columns(df)
+    finest = df.groupby(keys, observed=True)[measures].sum()
+
+    parts = []
+    for name, by in sets.items():
+        part = finest if list(by) == keys else finest.groupby(level=list(by), observed=True).sum()
+        part = part.reset_index()
+        for key in keys:
+            if key not in by:
+                # All-missing key of the same dtype, so categoricals stay categorical
+                part[key] = pd.Series(pd.array([None] * len(part), dtype=df[key].dtype), index=part.index)
+        part.insert(0, 'level', name)
+        parts.append(part[['level', *keys, *measures]])
+    table = pd.concat(parts, ignore_index=True)
+    table['level'] = pd.Categorical(table['level'], categories=list(sets))
+    table.attrs['grouping_sets'] = {name: list(by) for name, by in sets.items()}
+    return table
+
+
+def grouping_level(table, name, measures=None):
+    """One level of a grouping_sets table, indexed by its keys like rollup()"""
+    by = table.attrs['grouping_sets'][name]
+    part = table[table['level'] == name].set_index(by)
+    if measures is None:
+        measures = measure_columns(part)
+    return part[measures]
+
+
+def cube_name(dataset):
+    return f'{dataset}_cube'
+
+
+def save_cube(cube, dataset, shared_dir=SHARED_DIR):
+    return write_shared_table(cube, cube_name(dataset), shared_dir)
+
+
+def load_cube(dataset, shared_dir=SHARED_DIR):
+    cube = open_shared_table(cube_name(dataset), shared_dir=shared_dir)
+    return ensure_features(cube, dataset, [CUBE_TOTALS[dataset], 'year_month'])
+
+
+# Aggregates: per level, the sums of all three datasets side by side plus
+# the ratios the reports read, keyed by plain strings
+AGGREGATE_LEVELS = {
+    'state': ['state'],
+    'district': ['state', 'district'],
+    'year_month': ['year_month'],
+}
+# ratio -> (numerator, denominator, scale, decimals); x/0 and 0/0 give 0
+RATIOS = {
+    'child_pct': ('age_0_5', 'total_enrol', 100, 2),
+    'youth_pct': ('age_5_17', 'total_enrol', 100, 2),
+    'adult_pct': ('age_18_greater', 'total_enrol', 100, 2),
+    'Demo_to_Enrol_Ratio': ('total_demo', 'total_enrol', 1, None),
+    'Bio_to_Enrol_Ratio': ('total_bio', 'total_enrol', 1, None),
+    'Bio_to_Demo_Ratio': ('total_bio', 'total_demo', 1, None),
+}
+
+
+def safe_divide(numerator, denominator):
+    """numerator / denominator, with 0 wherever the denominator is 0"""
+    numerator = np.asarray(numerator, dtype='float64')
+    denominator = np.asarray(denominator, dtype='float64')
+    return np.divide(numerator, denominator, out=np.zeros(numerator.shape), where=denominator != 0)
+
+
+def string_keys(df):
+    """Re-index df by the string form of its keys"""
+    keys = df.index.to_frame(index=False).astype(str)
+    df.index = pd.MultiIndex.from_frame(keys) if keys.shape[1] > 1 else pd.Index(keys.iloc[:, 0])
+    return df
+
+
+def dataset_measures(dataset):
+    return CUBE_MEASURES[dataset] + [CUBE_TOTALS[dataset], 'rows']
+
+
+def join_sums(sums):
+    """{dataset: sums per key} side by side as one table"""
+    parts = [
+        string_keys(part.rename(columns={'rows': f'{dataset}_rows'})) for dataset, part in sums.items()
+    ]
+    measures = [
+        col if col != 'rows' else f'{dataset}_rows'
+        for dataset in CUBE_MEASURES for col in dataset_measures(dataset)
+    ]
+    table = pd.concat(parts, axis=1) if parts else pd.DataFrame()
+    return table.reindex(columns=measures).fillna(0).astype(MEASURE_DTYPE)
+
+
+def level_sums(cubes, by):
+    """Sums of every cube in {dataset: cube} per `by`, as one table"""
+    return join_sums({
+        dataset: rollup(cube, by, dataset_measures(dataset))
+        for dataset, cube in cubes.items() if cube is not None
+    })
+
+
+def levels_sums(cubes, levels):
+    """level_sums for every level in {level: by}, with one grouping_sets pass per cube"""
+    sets = {
+        dataset: grouping_sets(cube, levels, dataset_measures(dataset))
+        for dataset, cube in cubes.items() if cube is not None
+    }
+    return {
+        level: join_sums({dataset: grouping_level(table, level) for dataset, table in sets.items()})
+        for level in levels
+    }
+
+
+def update_ratios(table, keys=None):
+    """(Re)compute the RATIOS columns, for `keys` only if given"""
+    keys = table.index if keys is None else keys
+    sums = table.loc[keys]
+    for name, (numerator, denominator, scale, decimals) in RATIOS.items():
+        ratio = safe_divide(sums[numerator], sums[denominator]) * scale
+        table.loc[keys, name] = ratio if decimals is None else ratio.round(decimals)
+    return table
+
+
+def build_aggregates(cubes, levels=AGGREGATE_LEVELS):
+    return {level: update_ratios(table) for level, table in levels_sums(cubes, levels).items()}
+
+
+def refresh_aggregates(aggregates, deltas, levels=AGGREGATE_LEVELS):
+    """Add delta cubes ({dataset: delta}) to the aggregates.
+
+    Sums are updated by adding the deltas' rollups; ratios are recomputed
+    only for the keys those rollups touch. Keys left without rows in any
+    dataset are dropped.
+    """
+    deltas = {dataset: delta for dataset, delta in deltas.items() if delta is not None}
+    if not deltas:
+        return aggregates
+    refreshed = {}
+    for level, delta in levels_sums(deltas, levels).items():
+        table = aggregates[level]
+        measures = delta.columns
+        table = table.reindex(table.index.union(delta.index))
+        table[measures] = table[measures].fillna(0).astype(MEASURE_DTYPE).add(
+            delta.reindex(table.index, fill_value=0)
+        )
+        rows = [f'{dataset}_rows' for dataset in CUBE_MEASURES]
+        table = table[(table[rows] != 0).any(axis=1)].copy()
+        refreshed[level] = update_ratios(table, delta.index.intersection(table.index))
+    return refreshed
+
+
+def save_aggregates(aggregates, directory, versions=None):
+    """Write the aggregates plus the store versions they reflect (see load_aggregates)"""
+    os.makedirs(directory, exist_ok=True)
+    versions_path = os.path.join(directory, 'versions.json')
+    # Written last: half-written aggregates are never taken as up to date
+    if os.path.exists(versions_path):
+        os.remove(versions_path)
+    for level, table in aggregates.items():
+        table.to_parquet(os.path.join(directory, f'{level}.parquet'))
+    with open(versions_path, 'w') as f:
+        json.dump(versions, f, indent=2)
+
+
+def load_aggregates(directory, levels=AGGREGATE_LEVELS):
+    """(aggregates, versions) as saved, or (None, None)"""
+    paths = {level: os.path.join(directory, f'{level}.parquet') for level in levels}
+    versions_path = os.path.join(directory, 'versions.json')
+    if not all(os.path.exists(path) for path in [*paths.values(), versions_path]):
+        return None, None
+    with open(versions_path) as f:
+        versions = json.load(f)
+    return {level: pd.read_parquet(path) for level, path in paths.items()}, versions
@@ -1,101 +1,380 @@
+import os
+import json
+import glob
+import hashlib
 import pandas as pd
 import numpy as np
+from pandas.api.types import union_categoricals
+from gazetteer import load_gazetteer
+from cube import build_cube, negate_cube, merge_cubes, apply_delta
 
 print(" STARTING ROBUST DATA CLEANING...\n")
 
-def clean_dataframe(df, df_name):
-    print(f"Cleaning {df_name}...")
+ALL_COUNT_COLUMNS = [col for cols in COUNT_COLUMNS.values() for col in cols]
+
+# Canonical state/district names (replaces the old hardcoded mapping dicts)
+GAZETTEER = load_gazetteer()
+
+def apply_schema(df):
+    """Cast a cleaned frame to the compact schema defined in data_loading.py"""
+    for col in ('state', 'district'):
+        df[col] = df[col].astype('category')
+    if 'pincode' in df.columns:
+        # Missing/invalid pincodes become 0
+        df['pincode'] = pd.to_numeric(df['pincode'], errors='coerce').fillna(0).astype(PINCODE_DTYPE)
+    for col in df.columns.intersection(ALL_COUNT_COLUMNS):
+        df[col] = df[col].fillna(0).astype(COUNT_DTYPE)
+    return df
+
+def align_categories(frames, columns=('state', 'district')):
+    """Give every frame the same sorted categories so codes match across datasets"""
+    for col in columns:
+        categories = union_categoricals([df[col] for df in frames], sort_categories=True).categories
+        for df in frames:
+            df[col] = df[col].cat.set_categories(categories)
+
+def distinct_values(col):
+    """Row codes and distinct values of a column, as strings.
+
+    Missing values become 'nan', exactly as .astype(str) would give.
+    """
+    codes, uniques = pd.factorize(col)
+    uniques = pd.Index(list(np.asarray(uniques, dtype=object)) + [np.nan]).astype(str)
+    codes = np.where(codes < 0, len(uniques) - 1, codes)
+    return codes, uniques
+
+def from_distinct(codes, values):
+    """Broadcast per-distinct-value results back to rows as a sorted categorical.
+
+    Only values some row still uses become categories, so names whose rows
+    were all rejected do not linger as empty categories.
+    """
+    values = pd.Index(values)
+    categories = values[np.unique(codes)].unique().sort_values()
+    return pd.Categorical.from_codes(categories.get_indexer(values)[codes], categories=categories)
+
+def parse_dates(col, date_format='%d-%m-%Y'):
+    """Parse each distinct date string once and broadcast it to the rows.
+
+    Returns the datetime column plus two integer keys: day_key (days since
+    1970-01-01, int32) and month_key (months since 1970-01, int16; this is
+    the ordinal of the monthly Period). Unparseable dates give NaT / -1.
+    """
+    codes, uniques = pd.factorize(col)
+    dates = pd.to_datetime(np.asarray(uniques, dtype=object), format=date_format, errors='coerce')
+    valid = ~dates.isna()
+    day_keys = np.where(valid, dates.values.astype('datetime64[D]').astype('int64'), -1).astype('int32')
+    month_keys = np.where(valid, (dates.year - 1970) * 12 + dates.month - 1, -1).astype('int16')
+
+    # Missing values have code -1, which picks the NaT / -1 appended last
+    dates = np.append(dates.values, np.datetime64('NaT', 'ns'))
+    day_keys = np.append(day_keys, np.int32(-1))
+    month_keys = np.append(month_keys, np.int16(-1))
+    return dates[codes], day_keys[codes], month_keys[codes]
+
+def row_fingerprints(df):
+    """64-bit hash of every row's raw values.
+
+    Numeric columns are hashed as float64 so that the same row hashes the
+    same whether its file was parsed with int or float columns.
+    """
+    columns = sorted(df.columns)
+    numeric = df[columns].select_dtypes('number').columns
+    return pd.util.hash_pandas_object(
+        df[columns].astype({col: 'float64' for col in numeric}), index=False
+    ).to_numpy()
+
+class FingerprintIndex:
+    """Sorted fingerprints of every row seen so far (8 bytes per distinct row).
+
+    One index can be shared by all chunks and files of a dataset, so
+    duplicates are dropped across them without keeping the rows themselves.
+    """
+    def __init__(self, hashes=()):
+        self.hashes = np.unique(np.concatenate([np.empty(0, dtype='uint64'), *hashes]))
+        self.last_added = np.empty(0, dtype='uint64')
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add_new(self, df):
+        """Mask of the rows not seen before (first occurrence kept); records them"""
+        h = row_fingerprints(df)
+        keep = ~pd.Series(h).duplicated().to_numpy()
+        if len(self.hashes):
+            pos = np.minimum(np.searchsorted(self.hashes, h), len(self.hashes) - 1)
+            keep &= self.hashes[pos] != h
+        self.last_added = h[keep]
+        self.hashes = np.union1d(self.hashes, self.last_added)
+        return keep
+
+    def add(self, hashes):
+        """Record fingerprints kept from earlier (e.g. of a stored part)"""
+        self.hashes = np.union1d(self.hashes, hashes)
+
+# Row filters, declared as data. Each rule rejects the rows for which
+# `reject` is True. For state/district the test runs once per distinct
+# (title-cased) name and is broadcast through the codes; other columns are
+# tested on the whole cleaned column.
+# Missing state/district names already became 'Nan' (dropped by invalid_state
+# for states, kept for districts as before).
+CLEANING_RULES = [
+    # Non-geographic values: 'state' is a number (e.g., "100000")
+    {'name': 'numeric_state', 'column': 'state', 'reject': lambda names: names.str.match(r'^\d+$')},
+    # Cross-column leaks: known districts that appear in the state column
+    {'name': 'invalid_state', 'column': 'state',
+     'reject': lambda names: names.isin(['Darbhanga', 'Puttenahalli', 'Nan'])},
+    # Dates that did not parse as dd-mm-yyyy
+    {'name': 'invalid_date', 'column': 'date', 'reject': lambda dates: dates.isna()},
+]
+
+# Audit trail of every clean_dataframe call, per dataset
+CLEANING_AUDIT = {}
+
+def evaluate_rules(df, distinct, rules=CLEANING_RULES):
+    """Combined keep-mask of all rules, plus the rows rejected by each rule.
+
+    `distinct` maps a column to its (row codes, distinct values). A row
+    failing several rules is counted under each of them.
+    """
+    keep = np.ones(len(df), dtype=bool)
+    rejected = {}
+    for rule in rules:
+        column = rule['column']
+        if column in distinct:
+            codes, values = distinct[column]
+            mask = np.asarray(rule['reject'](values), dtype=bool)[codes]
+        else:
+            mask = np.asarray(rule['reject'](df[column]), dtype=bool)
+        rejected[rule['name']] = int(mask.sum())
+        keep &= ~mask
+    return keep, rejected
+
+def record_audit(df_name, rows_in, duplicates, rejected, rows_out):
+    """Add one call's counts to CLEANING_AUDIT (streamed chunks accumulate)"""
+    audit = CLEANING_AUDIT.setdefault(df_name, {'rows_in': 0, 'duplicates': 0, 'rows_out': 0})
+    audit['rows_in'] += rows_in
+    audit['duplicates'] += duplicates
+    audit['rows_out'] += rows_out
+    for name, count in rejected.items():
+        audit[name] = audit.get(name, 0) + count
+
+def clean_dataframe(df, df_name, verbose=True, seen=None):
+    if verbose:
+        print(f"Cleaning {df_name}...")
     original_count = len(df)
 
     # 1. Deduplication (Critical for large datasets)
-    df.drop_duplicates(inplace=True)
+    # Rows are compared by 64-bit fingerprint; `seen` carries the fingerprints
+    # of earlier chunks, files or ingest runs of the same dataset
+    if seen is None:
+        seen = FingerprintIndex()
+    # A copy, so the columns added below do not write into a slice
+    df = df[seen.add_new(df)].copy()
     dedupe_count = len(df)
-    if original_count > dedupe_count:
+    if verbose and original_count > dedupe_count:
         print(f"   Dropped {original_count - dedupe_count:,} duplicate rows")
 
     # 2. Convert Dates
-    df['date'] = pd.to_datetime(df['date'], format='%d-%m-%Y', errors='coerce')
+    # Only a few hundred distinct days: parse each once, plus integer day/month keys
+    df['date'], df['day_key'], df['month_key'] = parse_dates(df['date'])
     
     # 3. Standardize Case (Handle "West Bengal ", "west bengal")
-    # Convert to Title Case and strip whitespace
-    df['state'] = df['state'].astype(str).str.strip().str.title()
-    df['district'] = df['district'].astype(str).str.strip().str.title()
+    # Convert to Title Case and strip whitespace.
+    # Steps 3-6 run once per distinct name (a few dozen states, under a
+    # thousand districts) and are broadcast back to the rows via the codes.
+    state_codes, states = distinct_values(df['state'])
+    district_codes, districts = distinct_values(df['district'])
+    states = states.str.strip().str.title()
+    districts = districts.str.strip().str.title()
 
-    # 4. Remove Non-Geographic Values / Cross-Column Leaks
-    # Filter out rows where 'state' is a number (e.g., "100000")
-    df = df[~df['state'].str.match(r'^\d+$')]
-    
-    # Filter out known districts that appear in the state column
-    invalid_states = ['Darbhanga', 'Puttenahalli', 'Nan']
-    df = df[~df['state'].isin(invalid_states)]
-
-    # 5. COMPREHENSIVE STATE MAPPING (Fixing Typos & Legacy Names)
-    state_mapping = {
-        # Typos & Variations
-        'West Bangal': 'West Bengal',
-        'Westbengal': 'West Bengal',
-        'West Bengli': 'West Bengal',
-        'Wb': 'West Bengal',
-        'Jammu&Kashmir': 'Jammu And Kashmir',
-        'Jammu & Kashmir': 'Jammu And Kashmir',
-        'Nct Of Delhi': 'Delhi',
-        
-        # Conjunction Differences
-        'Andaman & Nicobar Islands': 'Andaman And Nicobar Islands',
-        'Dadra & Nagar Haveli': 'Dadra And Nagar Haveli',
-        'Daman & Diu': 'Daman And Diu',
-        
-        # Combined Territories (Standardizing to the new official merged name if you prefer, 
-        # OR keeping them separate. Here we keep separate for historical consistency 
-        # unless you want to merge them into "Dadra And Nagar Haveli And Daman And Diu")
-        'The Dadra And Nagar Haveli And Daman And Diu': 'Dadra And Nagar Haveli', 
-        
-        # Legacy Names (Standardize to CURRENT official names)
-        'Orissa': 'Odisha',
-        'Pondicherry': 'Puducherry',
-        'Uttaranchal': 'Uttarakhand'
-    }
-    df['state'] = df['state'].replace(state_mapping)
-    print(f"  Standardized State names (Fixed 'West Bengli', 'Orissa', etc.)")
-
-    # 6. COMPREHENSIVE DISTRICT MAPPING
-    district_mapping = {
-        # Compounded vs Separated
-        'Yamunanagar': 'Yamuna Nagar',
-        'Karimnagar': 'Karim Nagar',
-        'Ahmednagar': 'Ahmed Nagar',
-        'Mahbubnagar': 'Mahabub Nagar',
-        'Mahabubnagar': 'Mahabub Nagar',
-        
-        # Spelling Variations
-        'Chamrajanagar': 'Chamarajanagar',
-        'Villupuram': 'Viluppuram',
-        'Thiruvananthapuram': 'Thiruvananthpuram',
-        
-        # Word Substitutions
-        'South 24 Parganas': 'South Twenty Four Parganas',
-        'North 24 Parganas': 'North Twenty Four Parganas'
-    }
-    df['district'] = df['district'].replace(district_mapping)
-    print(f" Standardized District names (Fixed 'Yamunanagar', 'South 24 Parganas')")
-
-    # 7. Final Clean-up: Drop Invalid Dates or Empty States
-    before = len(df)
-    df = df.dropna(subset=['state', 'district', 'date'])
-    # Ensure pincode is string (preserves leading zeros if present)
-    if 'pincode' in df.columns:
-         df['pincode'] = df['pincode'].astype(str).str.replace(r'\.0$', '', regex=True)
+    # 4. Cleaning rules (see CLEANING_RULES): evaluated together into one
+    # mask and applied in a single materialization
+    keep, rejected = evaluate_rules(df, {'state': (state_codes, states), 'district': (district_codes, districts)})
+    df = df[keep]
+    state_codes, district_codes = state_codes[keep], district_codes[keep]
+
+    # 5. STATE NAMES: typos & legacy names resolved against the gazetteer
+    # (datasets/gazetteer.csv + gazetteer_aliases.csv, see gazetteer.py)
+    used = np.zeros(len(states), dtype=bool)
+    used[state_codes] = True
+    states = pd.Index([
+        GAZETTEER.resolve_state(name) if in_use else name for name, in_use in zip(states, used)
+    ])
+    df['state'] = from_distinct(state_codes, states)
+
+    # 6. DISTRICT NAMES: resolved within their state, once per distinct
+    # (state, district) pair
+    pair_codes, pairs = pd.factorize(state_codes * len(districts) + district_codes)
+    pair_districts = [
+        GAZETTEER.resolve_district(districts[d], states[s])
+        for s, d in zip(pairs // len(districts), pairs % len(districts))
+    ]
+    df['district'] = from_distinct(pair_codes, pair_districts)
+    GAZETTEER.save_memo()
+    if verbose:
+        print(f"  Standardized State & District names via gazetteer "
+              f"({len(GAZETTEER.unresolved('state'))} state / {len(GAZETTEER.unresolved('district'))} "
+              f"district names not in the gazetteer so far)")
+
+    # 7. Final Clean-up: compact types
+    df = apply_schema(df)
 
     after = len(df)
-    if dedupe_count > after:
+    record_audit(df_name, original_count, original_count - dedupe_count, rejected, after)
+    if verbose and dedupe_count > after:
         print(f" Removed {dedupe_count - after:,} rows with invalid/missing data")
-    
+        for name, count in rejected.items():
+            if count:
+                print(f"   - {name}: {count:,} rows")
+
     return df
 
+def store_path(dataset):
+    return os.path.join(STORE_DIR, dataset)
+
+# What each ingest_extracts call changed, per dataset: the store version
+# (see store_version) before and after, and the delta cube of the rows
+# added / taken out
+STORE_CHANGES = {}
+
+def store_version(manifest):
+    """Digest of the parts listed in a store manifest"""
+    parts = sorted(entry['part'] for entry in manifest.values())
+    return hashlib.blake2b(json.dumps(parts).encode(), digest_size=8).hexdigest()
+
+def store_cube_path(dataset, version):
+    # Named after the store version, so a cube left behind by an interrupted
+    # ingest is never taken for the current one
+    return os.path.join(store_path(dataset), f"cube-{version}.parquet")
+
+def load_store(dataset):
+    """All cleaned rows ingested so far for a dataset"""
+    manifest = load_manifest(os.path.join(store_path(dataset), 'manifest.json'))
+    parts = [entry['part'] for entry in manifest.values()]
+    return concat_extracts([pd.read_parquet(part) for part in parts])
+
+def ingest_extracts(dataset, files, df_name):
+    """Parse, clean and append only the extracts the store has not seen yet.
+
+    Each new (or modified) extract is cleaned on its own and written as a
+    new Parquet part. Rows already in the store are dropped by their
+    fingerprint: every part keeps the fingerprints of its raw rows next to
+    it, so the stored rows themselves are never read back.
+
+    A part only holds the rows that were new when it was ingested, so it
+    depends on every extract ingested before it (its lineage, which also
+    names the part). When an extract is modified, it and every extract
+    ingested after it are cleaned again in the same order, giving the
+    rows a full rebuild would; extracts whose file is gone keep their
+    part as stored.
+
+    The store also keeps the dataset's cube (see cube.py), which is only
+    updated with the delta of the rows added or taken out by this call.
+    """
+    manifest_path = os.path.join(store_path(dataset), 'manifest.json')
+    manifest = load_manifest(manifest_path)
+    version_before = store_version(manifest)
+    if os.path.exists(store_cube_path(dataset, version_before)):
+        cube = pd.read_parquet(store_cube_path(dataset, version_before))
+    elif manifest:
+        cube = build_cube(load_store(dataset), dataset)
+    else:
+        cube = None
+
+    # Walk the extracts in ingest order; from the first new, modified or
+    # out-of-lineage one on, everything is (re)ingested
+    lineage = hashlib.blake2b(digest_size=16)
+    seen_parts = []
+    plan = []
+    for file in list(manifest) + [file for file in files if file not in manifest]:
+        known = manifest.get(file)
+        fingerprint = file_fingerprint(file, known) if os.path.exists(file) else None
+        lineage.update((fingerprint or known)['hash'].encode())
+        digest = lineage.hexdigest()
+        if not plan and fingerprint is not None and (
+            not known or known['hash'] != fingerprint['hash'] or known.get('lineage', digest) != digest
+        ):
+            plan.append((file, fingerprint, digest))
+        elif plan:
+            plan.append((file, fingerprint, digest))
+        else:
+            seen_parts.append(known['fingerprints'])
+
+    deltas = []
+    for file, fingerprint, _ in plan:
+        if fingerprint is not None and file in manifest:
+            # Its old rows are taken out; the new ones are added below
+            deltas.append(negate_cube(build_cube(pd.read_parquet(manifest[file]['part']), dataset)))
+
+    seen = FingerprintIndex([np.load(part) for part in seen_parts])
+    for file, fingerprint, digest in plan:
+        known = manifest.get(file)
+        if fingerprint is None:
+            # Raw extract gone: its stored rows stay, and stay seen
+            seen.add(np.load(known['fingerprints']))
+            continue
+        df = clean_dataframe(load_csv_files([file])[0], f"{df_name} ({file})", seen=seen)
+
+        part = os.path.join(store_path(dataset), f"part-{digest}.parquet")
+        fingerprints = os.path.join(store_path(dataset), f"part-{digest}.fingerprints.npy")
+        os.makedirs(store_path(dataset), exist_ok=True)
+        df.to_parquet(part, index=False)
+        np.save(fingerprints, seen.last_added)
+        manifest[file] = dict(fingerprint, part=part, fingerprints=fingerprints, lineage=digest, rows=len(df))
+        save_manifest(manifest, manifest_path)
+        if known:
+            # Only now that the manifest points at the new part
+            for old in (known['part'], known['fingerprints']):
+                if old not in (part, fingerprints) and os.path.exists(old):
+                    os.remove(old)
+        if len(df):
+            deltas.append(build_cube(df, dataset))
+        if known and known['hash'] == fingerprint['hash']:
+            print(f"   Re-cleaned {file} after an earlier extract changed: {len(df):,} rows")
+        else:
+            print(f"   Ingested {file}: {len(df):,} new rows")
+
+    delta = merge_cubes(deltas, dataset) if deltas else None
+    cube = apply_delta(cube, delta, dataset)
+    version = store_version(manifest)
+    cube_path = store_cube_path(dataset, version)
+    if cube is not None and not os.path.exists(cube_path):
+        cube.to_parquet(cube_path, index=False)
+        for old in glob.glob(store_cube_path(dataset, '*')):
+            if old != cube_path:
+                os.remove(old)
+    STORE_CHANGES[dataset] = {'before': version_before, 'after': version, 'delta': delta}
+    return load_store(dataset)
+
+def load_store_cube(dataset):
+    """The dataset's cube as kept up to date by ingest_extracts"""
+    manifest = load_manifest(os.path.join(store_path(dataset), 'manifest.json'))
+    return build_cube(pd.read_parquet(store_cube_path(dataset, store_version(manifest))), dataset)
+
 # Execute the new cleaning function
-enrol = clean_dataframe(enrol, "ENROLLMENT")
-demo = clean_dataframe(demo, "DEMOGRAPHIC")
-bio = clean_dataframe(bio, "BIOMETRIC")
+# (in streaming mode each chunk is cleaned by stream_cube in features.py)
+if INCREMENTAL:
+    enrol = ingest_extracts('enrol', enrol_files, "ENROLLMENT")
+    demo = ingest_extracts('demo', demo_files, "DEMOGRAPHIC")
+    bio = ingest_extracts('bio', bio_files, "BIOMETRIC")
+    print(f"\n Stored records: Enrollment {len(enrol):,} | Demographic {len(demo):,} | Biometric {len(bio):,}")
+elif not STREAMING:
+    enrol = clean_dataframe(enrol, "ENROLLMENT")
+    demo = clean_dataframe(demo, "DEMOGRAPHIC")
+    bio = clean_dataframe(bio, "BIOMETRIC")
+
+if not STREAMING:
+    # Shared state/district codes let the cross-dataset group-bys and joins
+    # run on integer codes
+    align_categories([enrol, demo, bio])
+    memory_mb = sum(df.memory_usage(deep=True).sum() for df in (enrol, demo, bio)) / 1e6
+    print(f"\n Cleaned data in memory: {memory_mb:,.1f} MB")
+
+# (in streaming mode the audit is filled, and shown, by features.py)
+if CLEANING_AUDIT:
+    print("\n📋 CLEANING AUDIT (rows rejected per rule):")
+    display(pd.DataFrame(CLEANING_AUDIT).T)
 
 print("\n" + "="*60)
 print(" ROBUST DATA CLEANING COMPLETE!")
@@ -1,80 +1,224 @@
-
-print(" Loading Enrollment Data...")
-enrol_files = [
-    'aadhar enrollment.csv',
-    'aadhar enrollment 2.csv',
-    'aadhar enrollment 3.csv'
-]
-
-enrol_dfs = []
-for file in enrol_files:
-    df = pd.read_csv(file)
-    enrol_dfs.append(df)
-    print(f" Loaded {file}: {len(df):,} rows")
-
-enrol = pd.concat(enrol_dfs, ignore_index=True)
-print(f"\nTotal Enrollment records: {len(enrol):,}\n")
-
-# Load Demographic data (5 files)
-print(" Loading Demographic Data...")
-demo_files = [
-    'demograph.csv',
-    'demograph2.csv',
-    'demograph3.csv',
-    'demograph4.csv',
-    'demograph5.csv'
-]
-
-demo_dfs = []
-for file in demo_files:
-    df = pd.read_csv(file)
-    demo_dfs.append(df)
-    print(f" Loaded {file}: {len(df):,} rows")
-
-demo = pd.concat(demo_dfs, ignore_index=True)
-print(f"\n Total Demographic records: {len(demo):,}\n")
-
-# Load Biometric data (4 files)
-print(" Loading Biometric Data...")
-bio_files = [
-    'biometric.csv',
-    'biometric1.csv',
-    'biometric3.csv',
-    'biometric4.csv'
-]
-
-bio_dfs = []
-for file in bio_files:
-    df = pd.read_csv(file)
-    bio_dfs.append(df)
-    print(f" Loaded {file}: {len(df):,} rows")
-
-bio = pd.concat(bio_dfs, ignore_index=True)
-print(f"\nTotal Biometric records: {len(bio):,}\n")
-
-
-print(f" SUMMARY:")
-print(f"   Enrollment: {len(enrol):,} records")
-print(f"   Demographic: {len(demo):,} records")
-print(f"   Biometric: {len(bio):,} records")
-
-print("📋 ENROLLMENT DATA STRUCTURE")
-print(f"Shape: {enrol.shape}")
-print(f"\nColumns: {list(enrol.columns)}")
-print(f"\nData types:\n{enrol.dtypes}")
-print(f"\nFirst 5 rows:")
-display(enrol.head())
-print(f"\nBasic stats:")
-display(enrol.describe())
-
-print("📋 DEMOGRAPHIC DATA STRUCTURE")
-
-print(f"Shape: {demo.shape}")
-print(f"\nColumns: {list(demo.columns)}")
-display(demo.head())
-
-
-print("📋 BIOMETRIC DATA STRUCTURE")
-print(f"Shape: {bio.shape}")
-print(f"\nColumns: {list(bio.columns)}")
-display(bio.head())
\ No newline at end of file
+import os
+import re
+import json
+import glob
+import hashlib
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from pandas.api.types import union_categoricals
+
+# Parsed extracts are cached as Parquet so a warm start skips the CSV parsing.
+# Each cache entry is keyed by the source file's size, mtime and content hash.
+CACHE_DIR = 'cache'
+RAW_CACHE_DIR = os.path.join(CACHE_DIR, 'raw')
+RAW_MANIFEST = os.path.join(RAW_CACHE_DIR, 'manifest.json')
+
+# Parallel parsing (None = one worker per core)
+LOAD_WORKERS = None
+
+# Extracts are discovered by file name instead of being listed by hand.
+# New dumps dropped into DATA_DIR are picked up on the next run.
+DATA_DIR = '.'
+EXTRACT_PATTERNS = {
+    'enrol': 'aadhar enrollment*.csv',
+    'demo': 'demograph*.csv',
+    'bio': 'biometric*.csv',
+}
+
+# Incremental mode: cleaned rows are kept in cache/store/<dataset> and only
+# extracts missing from the store manifest are parsed and cleaned
+# (see ingest_extracts in data_cleaning.py).
+INCREMENTAL = False
+STORE_DIR = os.path.join(CACHE_DIR, 'store')
+
+# Compact schema for the three datasets.
+# Geography and the raw date strings are read as categoricals (a few thousand
+# distinct values over millions of rows); clean_dataframe then applies
+# apply_schema() to get categorical state/district, uint32 pincodes and
+# int32 age counts.
+READ_DTYPES = {'date': 'category', 'state': 'category', 'district': 'category'}
+COUNT_COLUMNS = {
+    'enrol': ['age_0_5', 'age_5_17', 'age_18_greater'],
+    'demo': ['demo_age_5_17', 'demo_age_17_'],
+    'bio': ['bio_age_5_17', 'bio_age_17_'],
+}
+COUNT_DTYPE = 'int32'
+PINCODE_DTYPE = 'uint32'
+
+# Streaming mode: never materialize the full enrol/demo/bio frames.
+# Extracts are read CHUNK_SIZE rows at a time and only the pre-aggregated
+# cube of each dataset is kept (see stream_cube in features.py and cube.py).
+STREAMING = False
+CHUNK_SIZE = 250_000
+
+
+def file_hash(path, block_size=1 << 20):
+    """Content hash of a file, read in 1 MB blocks"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_fingerprint(path, known=None):
+    """Size, mtime and content hash of a file.
+
+    The content hash is only recomputed when size or mtime differ from the
+    `known` fingerprint, so unchanged files are never re-read on a warm start.
+    """
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+    if known and known['size'] == fingerprint['size'] and known['mtime'] == fingerprint['mtime']:
+        fingerprint['hash'] = known['hash']
+    else:
+        fingerprint['hash'] = file_hash(path)
+    return fingerprint
+
+
+def load_manifest(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(manifest, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_csv_files(files, workers=LOAD_WORKERS):
+    """Load a list of CSV extracts, re-parsing only files that changed.
+
+    Cached files are read back from Parquet; the rest are parsed in parallel
+    across cores and written to the cache. Returns one DataFrame per file,
+    in the order of `files`.
+    """
+    os.makedirs(RAW_CACHE_DIR, exist_ok=True)
+    manifest = load_manifest(RAW_MANIFEST)
+
+    fingerprints = {file: file_fingerprint(file, manifest.get(file)) for file in files}
+    cache_paths = {
+        file: os.path.join(RAW_CACHE_DIR, f"{os.path.splitext(os.path.basename(file))[0]}-{fp['hash']}.parquet")
+        for file, fp in fingerprints.items()
+    }
+    schema = repr(sorted(READ_DTYPES.items()))
+    stale = [
+        file for file in files
+        if manifest.get(file, {}).get('hash') != fingerprints[file]['hash']
+        or manifest.get(file, {}).get('schema') != schema
+        or not os.path.exists(cache_paths[file])
+    ]
+
+    frames = {}
+    if stale:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for file, df in zip(stale, pool.map(partial(pd.read_csv, dtype=READ_DTYPES), stale)):
+                df.to_parquet(cache_paths[file], index=False)
+                old_cache = manifest.get(file, {}).get('cache')
+                if old_cache and old_cache != cache_paths[file] and os.path.exists(old_cache):
+                    os.remove(old_cache)
+                frames[file] = df
+                print(f" Loaded {file}: {len(df):,} rows (parsed)")
+
+    for file in files:
+        if file not in frames:
+            frames[file] = pd.read_parquet(cache_paths[file])
+            print(f" Loaded {file}: {len(frames[file]):,} rows (cached)")
+        manifest[file] = dict(fingerprints[file], cache=cache_paths[file], schema=schema)
+
+    save_manifest(manifest, RAW_MANIFEST)
+    return [frames[file] for file in files]
+
+
+def concat_extracts(frames):
+    """pd.concat that keeps categorical columns categorical across files"""
+    frames = [df for df in frames if len(df.columns) > 0]
+    if not frames:
+        return pd.DataFrame()
+    for col in frames[0].select_dtypes('category').columns:
+        categories = union_categoricals([df[col] for df in frames], sort_categories=True).categories
+        for df in frames:
+            df[col] = df[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+# Outputs of anomaly_model.py (<extract>.scored.csv) are never extracts,
+# even when scored next to them
+SCORED_SUFFIX = '.scored.csv'
+
+
+def discover_extracts(pattern, data_dir=DATA_DIR):
+    """CSV extracts matching `pattern`, in dump order ('x.csv', 'x2.csv', 'x 3.csv')"""
+    def dump_number(path):
+        digits = re.findall(r'\d+', os.path.basename(path))
+        return (int(digits[-1]) if digits else 0, path)
+    paths = [
+        os.path.normpath(path) for path in glob.glob(os.path.join(data_dir, pattern))
+        if not path.endswith(SCORED_SUFFIX)
+    ]
+    return sorted(paths, key=dump_number)
+
+
+def iter_csv_chunks(files, chunksize=CHUNK_SIZE):
+    """Yield (file, chunk) pairs of at most `chunksize` rows per extract"""
+    for file in files:
+        for chunk in pd.read_csv(file, chunksize=chunksize, dtype=READ_DTYPES):
+            yield file, chunk
+
+
+enrol_files = discover_extracts(EXTRACT_PATTERNS['enrol'])
+demo_files = discover_extracts(EXTRACT_PATTERNS['demo'])
+bio_files = discover_extracts(EXTRACT_PATTERNS['bio'])
+
+if STREAMING or INCREMENTAL:
+    if STREAMING:
+        print(f" Streaming mode: extracts will be read in chunks of {CHUNK_SIZE:,} rows")
+    else:
+        print(f" Incremental mode: only extracts not yet in {STORE_DIR} will be parsed")
+    print(f"   Enrollment: {len(enrol_files)} files")
+    print(f"   Demographic: {len(demo_files)} files")
+    print(f"   Biometric: {len(bio_files)} files")
+else:
+    print(" Loading Enrollment Data...")
+    enrol = concat_extracts(load_csv_files(enrol_files))
+    print(f"\nTotal Enrollment records: {len(enrol):,}\n")
+
+    print(" Loading Demographic Data...")
+    demo = concat_extracts(load_csv_files(demo_files))
+    print(f"\n Total Demographic records: {len(demo):,}\n")
+
+    print(" Loading Biometric Data...")
+    bio = concat_extracts(load_csv_files(bio_files))
+    print(f"\nTotal Biometric records: {len(bio):,}\n")
+
+
+    print(f" SUMMARY:")
+    print(f"   Enrollment: {len(enrol):,} records")
+    print(f"   Demographic: {len(demo):,} records")
+    print(f"   Biometric: {len(bio):,} records")
+
+    print("📋 ENROLLMENT DATA STRUCTURE")
+    print(f"Shape: {enrol.shape}")
+    print(f"\nColumns: {list(enrol.columns)}")
+    print(f"\nData types:\n{enrol.dtypes}")
+    print(f"\nFirst 5 rows:")
+    display(enrol.head())
+    print(f"\nBasic stats:")
+    display(enrol.describe())
+
+    print("📋 DEMOGRAPHIC DATA STRUCTURE")
+
+    print(f"Shape: {demo.shape}")
+    print(f"\nColumns: {list(demo.columns)}")
+    display(demo.head())
+
+
+    print("📋 BIOMETRIC DATA STRUCTURE")
+    print(f"Shape: {bio.shape}")
+    print(f"\nColumns: {list(bio.columns)}")
+    display(bio.head())
@@ -3,12 +3,7 @@ print("📊 UNIVARIATE ANALYSIS: DISTRICT-LEVEL DISTRIBUTION")
 print("="*60)
 
 # Aggregate by district
-district_enrol = enrol.groupby(['state', 'district']).agg({
-    'total_enrol': 'sum',
-    'age_0_5': 'sum',
-    'age_5_17': 'sum',
-    'age_18_greater': 'sum'
-}).reset_index()
+district_enrol = grouping_level(enrol_levels, 'district', ['total_enrol', 'age_0_5', 'age_5_17', 'age_18_greater']).reset_index()
 
 district_enrol = district_enrol.sort_values('total_enrol', ascending=False)
 
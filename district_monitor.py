@@ -0,0 +1,150 @@
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+from integrity import shared_codes, GHOST_MIN_ENROLLMENTS, GHOST_MAX_DEMO_RATIO
+from cube import CUBE_MEASURES, safe_divide
+
+print("="*70)
+print("🔍 ROLLING-WINDOW GHOST / DEAD DISTRICT MONITOR")
+print("="*70)
+print("\n💡 The district checks of fraud_detection.py run once over the whole")
+print("   period, so a district that went silent in October is hidden by its")
+print("   earlier activity. Here they are evaluated over sliding windows.\n")
+
+# Window name -> length in days (a window ends on every day of the history)
+MONITOR_WINDOWS = {'weekly': 7, 'monthly': 30, 'trailing_90d': 90}
+
+def district_day_totals(frames):
+    """Dense (district × day) totals of every dataset in {dataset: rows}.
+
+    Districts are (state, district) pairs coded the same way in all
+    datasets. Returns (districts, first_day, {dataset: totals matrix}).
+    """
+    datasets = list(frames)
+    state_codes, states = shared_codes([frames[d]['state'] for d in datasets])
+    district_codes, districts = shared_codes([frames[d]['district'] for d in datasets])
+    pairs = [s * len(districts) + c for s, c in zip(state_codes, district_codes)]
+    pair_keys, pair_index = np.unique(np.concatenate(pairs), return_inverse=True)
+    bounds = np.cumsum([0] + [len(p) for p in pairs])
+
+    day_keys = [frames[d]['day_key'].to_numpy() for d in datasets]
+    first_day = min(days.min() for days in day_keys)
+    span = max(days.max() for days in day_keys) - first_day + 1
+
+    totals = {}
+    for dataset, days, start, end in zip(datasets, day_keys, bounds[:-1], bounds[1:]):
+        cell = pair_index[start:end] * span + (days - first_day)
+        matrix = sum(
+            np.bincount(cell, weights=frames[dataset][col].to_numpy(), minlength=len(pair_keys) * span)
+            for col in CUBE_MEASURES[dataset]
+        )
+        totals[dataset] = matrix.reshape(len(pair_keys), span)
+
+    district_table = pd.DataFrame({
+        'state': pd.Categorical.from_codes(pair_keys // len(districts), categories=states),
+        'district': pd.Categorical.from_codes(pair_keys % len(districts), categories=districts),
+    })
+    return district_table, first_day, totals
+
+def window_sums(matrix, window):
+    """Sum of every `window`-day window (ending on each day) per row, from cumulative sums"""
+    cumulative = np.zeros((matrix.shape[0], matrix.shape[1] + 1))
+    np.cumsum(matrix, axis=1, out=cumulative[:, 1:])
+    return cumulative[:, window:] - cumulative[:, :-window]
+
+def flag_span(flags, first_end_day):
+    """First / last flagged window end (day keys, -1 if never) and number of flagged windows"""
+    flagged = flags.any(axis=1)
+    first = np.where(flagged, flags.argmax(axis=1), -1)
+    last = np.where(flagged, flags.shape[1] - 1 - flags[:, ::-1].argmax(axis=1), -1)
+    return (
+        np.where(flagged, first + first_end_day, -1),
+        np.where(flagged, last + first_end_day, -1),
+        flags.sum(axis=1),
+    )
+
+def day_dates(day_keys):
+    return pd.to_datetime(np.where(day_keys >= 0, day_keys, np.nan), unit='D')
+
+if STREAMING:
+    print("⚠️  Streaming mode keeps no rows; the monitor needs day-level data (run without STREAMING)")
+    district_flags = pd.DataFrame()
+else:
+    monitor_districts, first_day, day_totals = district_day_totals({'enrol': enrol, 'demo': demo, 'bio': bio})
+    n_days = day_totals['enrol'].shape[1]
+    print(f"📅 {len(monitor_districts):,} districts × {n_days} days "
+          f"({day_dates(np.array([first_day]))[0]:%Y-%m-%d} onwards)")
+
+    reports = []
+    flagged_over_time = {}
+    for name, window in MONITOR_WINDOWS.items():
+        if window > n_days:
+            print(f"   Skipping {name}: history shorter than {window} days")
+            continue
+        e, d, b = (window_sums(day_totals[ds], window) for ds in ('enrol', 'demo', 'bio'))
+        ghost = (e > GHOST_MIN_ENROLLMENTS) & (safe_divide(d, e) < GHOST_MAX_DEMO_RATIO)
+        dead = (e == 0) & (d == 0) & (b == 0)
+
+        first_end_day = first_day + window - 1
+        report = monitor_districts.copy()
+        report.insert(0, 'window', name)
+        for label, flags in (('ghost', ghost), ('dead', dead)):
+            first, last, count = flag_span(flags, first_end_day)
+            report[f'{label}_first'] = day_dates(first)
+            report[f'{label}_last'] = day_dates(last)
+            report[f'{label}_windows'] = count
+        # Flagged in the most recent window
+        report['ghost_now'] = ghost[:, -1]
+        report['dead_now'] = dead[:, -1]
+        report['ever_active'] = ~dead.all(axis=1)
+        reports.append(report[(report['ghost_windows'] > 0) | (report['dead_windows'] > 0)])
+        flagged_over_time[name] = pd.DataFrame(
+            {'ghost': ghost.sum(axis=0), 'dead': dead.sum(axis=0)},
+            index=day_dates(np.arange(first_end_day, first_day + n_days)),
+        )
+
+    district_flags = pd.concat(reports, ignore_index=True) if reports else pd.DataFrame()
+
+    print("\n📊 DISTRICTS FLAGGED AT LEAST ONCE:")
+    if len(district_flags):
+        summary = district_flags.groupby('window', sort=False).agg(
+            ghost=('ghost_windows', lambda s: int((s > 0).sum())),
+            dead=('dead_windows', lambda s: int((s > 0).sum())),
+            ghost_now=('ghost_now', 'sum'),
+            dead_now=('dead_now', 'sum'),
+        )
+        display(summary)
+
+        # Went silent: dead in the latest window but active in an earlier one
+        silent = district_flags[district_flags['dead_now'] & district_flags['ever_active']]
+        print(f"\n💀 DISTRICTS SILENT IN THE LATEST WINDOW: {silent[['state', 'district']].drop_duplicates().shape[0]}")
+        if len(silent):
+            display(silent[['window', 'state', 'district', 'dead_first', 'dead_last', 'dead_windows']].head(20))
+
+        ghosts = district_flags[district_flags['ghost_windows'] > 0].sort_values('ghost_windows', ascending=False)
+        print(f"\n🚨 GHOST WINDOWS (enrollments > {GHOST_MIN_ENROLLMENTS}, demo_ratio < {GHOST_MAX_DEMO_RATIO}):")
+        if len(ghosts):
+            display(ghosts[['window', 'state', 'district', 'ghost_first', 'ghost_last', 'ghost_windows']].head(20))
+        else:
+            print("   None")
+    else:
+        print("✅ No district is ghost or dead in any window")
+
+    # Flagged districts per day, for every window length
+    if flagged_over_time:
+        fig, axes = plt.subplots(1, 2, figsize=(18, 6))
+        for name, counts in flagged_over_time.items():
+            axes[0].plot(counts.index, counts['ghost'], linewidth=2, label=name)
+            axes[1].plot(counts.index, counts['dead'], linewidth=2, label=name)
+        axes[0].set_title('Ghost Districts per Window End', fontsize=14, fontweight='bold')
+        axes[1].set_title('Dead Districts per Window End', fontsize=14, fontweight='bold')
+        for ax in axes:
+            ax.set_xlabel('Window end', fontweight='bold')
+            ax.set_ylabel('Districts flagged', fontweight='bold')
+            ax.legend()
+            ax.grid(alpha=0.3)
+        plt.tight_layout()
+        plt.savefig('district_monitor.png', dpi=300, bbox_inches='tight')
+        plt.show()
+
+print("\n" + "="*70)
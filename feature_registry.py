@@ -0,0 +1,109 @@
+"""Derived columns of enrol/demo/bio, declared once and computed on demand.
+
+Nothing is added to a frame until a script asks for it:
+
+    from feature_registry import ensure_features
+    ensure_features(enrol, 'enrol', ['total_enrol', 'youth_pct'])
+
+Features a requested feature depends on are computed first. A computed
+column is cached on the frame and reused until one of its inputs changes:
+every feature records the length and buffer address of its input columns
+in df.attrs, so reassigning or reloading an input column (or filtering
+the frame) recomputes it. In-place writes into an input column keep its
+buffer and are not detected; call invalidate_features after those.
+"""
+import numpy as np
+import pandas as pd
+
+# Percentages are float64 by default; 'float32' halves their memory
+FEATURE_FLOAT_DTYPE = 'float64'
+
+
+def percentage(part, total):
+    return lambda df: (df[part] / df[total] * 100).round(2).astype(FEATURE_FLOAT_DTYPE)
+
+
+def month_period(df):
+    return pd.PeriodIndex.from_ordinals(df['month_key'].to_numpy(), freq='M')
+
+
+def year_month_labels(df):
+    """'YYYY-MM' categorical, formatted once per distinct month"""
+    month_keys, codes = np.unique(df['month_key'].to_numpy(), return_inverse=True)
+    labels = pd.PeriodIndex.from_ordinals(month_keys, freq='M').strftime('%Y-%m')
+    return pd.Categorical.from_codes(codes, categories=labels)
+
+
+MONTH_FEATURES = {
+    'month': {'inputs': ['month_key'], 'compute': month_period},
+    'year_month': {'inputs': ['month_key'], 'compute': year_month_labels},
+}
+
+# dataset -> feature -> {'inputs': columns it reads, 'compute': df -> values}
+FEATURES = {
+    'enrol': {
+        'total_enrol': {
+            'inputs': ['age_0_5', 'age_5_17', 'age_18_greater'],
+            'compute': lambda df: df['age_0_5'] + df['age_5_17'] + df['age_18_greater'],
+        },
+        'youth_pct': {'inputs': ['age_5_17', 'total_enrol'], 'compute': percentage('age_5_17', 'total_enrol')},
+        'child_pct': {'inputs': ['age_0_5', 'total_enrol'], 'compute': percentage('age_0_5', 'total_enrol')},
+        'adult_pct': {'inputs': ['age_18_greater', 'total_enrol'], 'compute': percentage('age_18_greater', 'total_enrol')},
+        **MONTH_FEATURES,
+    },
+    'demo': {
+        'total_demo': {
+            'inputs': ['demo_age_5_17', 'demo_age_17_'],
+            'compute': lambda df: df['demo_age_5_17'] + df['demo_age_17_'],
+        },
+        'demo_youth_pct': {'inputs': ['demo_age_5_17', 'total_demo'], 'compute': percentage('demo_age_5_17', 'total_demo')},
+        **MONTH_FEATURES,
+    },
+    'bio': {
+        'total_bio': {
+            'inputs': ['bio_age_5_17', 'bio_age_17_'],
+            'compute': lambda df: df['bio_age_5_17'] + df['bio_age_17_'],
+        },
+        'bio_youth_pct': {'inputs': ['bio_age_5_17', 'total_bio'], 'compute': percentage('bio_age_5_17', 'total_bio')},
+        **MONTH_FEATURES,
+    },
+}
+
+
+def column_version(col):
+    """(length, buffer address) of a numeric or categorical column"""
+    values = col.array
+    values = values.codes if isinstance(values, pd.Categorical) else values.to_numpy()
+    return (len(values), values.__array_interface__['data'][0])
+
+
+def ensure_features(df, dataset, names):
+    """Add the requested features (and what they depend on) to df if missing or stale.
+
+    `names` may also list base columns, which are left as they are.
+    """
+    registry = FEATURES[dataset]
+    cache = df.attrs.setdefault('features', {})
+
+    def ensure(name):
+        if name not in registry:
+            return
+        spec = registry[name]
+        for dep in spec['inputs']:
+            ensure(dep)
+        version = [column_version(df[col]) for col in spec['inputs']]
+        if name in df.columns and cache.get(name) == version:
+            return
+        df[name] = spec['compute'](df)
+        cache[name] = version
+
+    for name in names:
+        ensure(name)
+    return df
+
+
+def invalidate_features(df, names=None):
+    """Forget cached features so the next ensure_features recomputes them"""
+    cache = df.attrs.get('features', {})
+    for name in list(cache) if names is None else names:
+        cache.pop(name, None)
@@ -1,36 +1,103 @@
+from shared_store import write_shared_table, SHARED_DIR
+from feature_registry import FEATURES, ensure_features
+from cube import build_cube, merge_cubes, rollup, save_cube, grouping_sets, grouping_level, build_aggregates, refresh_aggregates, save_aggregates, load_aggregates
+
 print(" FEATURE ENGINEERING...\n")
 
-# ENROLLMENT: Create total and derived columns
-enrol['total_enrol'] = enrol['age_0_5'] + enrol['age_5_17'] + enrol['age_18_greater']
-enrol['youth_pct'] = (enrol['age_5_17'] / enrol['total_enrol'] * 100).round(2)
-enrol['child_pct'] = (enrol['age_0_5'] / enrol['total_enrol'] * 100).round(2)
-enrol['adult_pct'] = (enrol['age_18_greater'] / enrol['total_enrol'] * 100).round(2)
-enrol['month'] = enrol['date'].dt.to_period('M')
-enrol['year_month'] = enrol['date'].dt.strftime('%Y-%m')
-print("✅ Enrollment features created")
-
-# DEMOGRAPHIC: Create total and derived columns
-demo['total_demo'] = demo['demo_age_5_17'] + demo['demo_age_17_']
-demo['demo_youth_pct'] = (demo['demo_age_5_17'] / demo['total_demo'] * 100).round(2)
-demo['month'] = demo['date'].dt.to_period('M')
-demo['year_month'] = demo['date'].dt.strftime('%Y-%m')
-print("✅ Demographic features created")
-
-# BIOMETRIC: Create total and derived columns
-bio['total_bio'] = bio['bio_age_5_17'] + bio['bio_age_17_']
-bio['bio_youth_pct'] = (bio['bio_age_5_17'] / bio['total_bio'] * 100).round(2)
-bio['month'] = bio['date'].dt.to_period('M')
-bio['year_month'] = bio['date'].dt.strftime('%Y-%m')
-print("✅ Biometric features created")
-
-# Display date ranges
-print("\n" + "="*60)
-print("📅 DATE RANGES:")
-print(f"Enrollment: {enrol['date'].min()} to {enrol['date'].max()}")
-print(f"Demographic: {demo['date'].min()} to {demo['date'].max()}")
-print(f"Biometric: {bio['date'].min()} to {bio['date'].max()}")
-print("="*60)
-
-# Display sample
-print("\n📊 Sample of cleaned enrollment data:")
-display(enrol[['date', 'state', 'district', 'total_enrol', 'youth_pct', 'child_pct', 'adult_pct']].head())
\ No newline at end of file
+def stream_cube(files, dataset, df_name, chunksize=CHUNK_SIZE):
+    """Clean and aggregate one chunk at a time into the dataset's cube.
+
+    Peak memory is one chunk plus the running cube and the row fingerprints
+    used to drop duplicates across chunks, whatever the dataset size.
+    """
+    cube = None
+    seen = FingerprintIndex()
+    rows = 0
+    for file, chunk in iter_csv_chunks(files, chunksize):
+        chunk = clean_dataframe(chunk, df_name, verbose=False, seen=seen)
+        rows += len(chunk)
+        cube = merge_cubes([cube, build_cube(chunk, dataset)], dataset)
+    print(f"✅ {df_name}: streamed {rows:,} cleaned rows into {len(cube):,} cube cells")
+    return cube
+
+if STREAMING:
+    enrol_cube = stream_cube(enrol_files, 'enrol', 'ENROLLMENT')
+    demo_cube = stream_cube(demo_files, 'demo', 'DEMOGRAPHIC')
+    bio_cube = stream_cube(bio_files, 'bio', 'BIOMETRIC')
+    align_categories([enrol_cube, demo_cube, bio_cube])
+
+    # The chunks are cleaned here, not in the cleaning cell, so their
+    # audit is reported here too
+    print("\n📋 CLEANING AUDIT (rows rejected per rule):")
+    display(pd.DataFrame(CLEANING_AUDIT).T)
+
+    print("\n" + "="*60)
+    print("📅 MONTHS COVERED:")
+    for label, cube in (('Enrollment', enrol_cube), ('Demographic', demo_cube), ('Biometric', bio_cube)):
+        months = rollup(cube, 'year_month').index
+        print(f"{label}: {months[0]} to {months[-1]}")
+    print("="*60)
+else:
+    # Derived columns are computed on first use: each analysis calls
+    # ensure_features for the columns it reads (see feature_registry.py)
+    for name in ('enrol', 'demo', 'bio'):
+        print(f"✅ {name}: {', '.join(FEATURES[name])} available on demand")
+
+    # Display date ranges
+    print("\n" + "="*60)
+    print("📅 DATE RANGES:")
+    print(f"Enrollment: {enrol['date'].min()} to {enrol['date'].max()}")
+    print(f"Demographic: {demo['date'].min()} to {demo['date'].max()}")
+    print(f"Biometric: {bio['date'].min()} to {bio['date'].max()}")
+    print("="*60)
+
+    # Display sample
+    print("\n📊 Sample of cleaned enrollment data:")
+    sample = ensure_features(enrol.head().copy(), 'enrol', ['total_enrol', 'youth_pct', 'child_pct', 'adult_pct'])
+    display(sample[['date', 'state', 'district', 'total_enrol', 'youth_pct', 'child_pct', 'adult_pct']])
+
+    # Persist the cleaned tables for other processes (open them with
+    # shared_store.open_shared_tables, then ensure_features as needed)
+    for name, df in (('enrol', enrol), ('demo', demo), ('bio', bio)):
+        write_shared_table(df, name)
+    print(f"\n💾 Shared memory-mapped tables written to {SHARED_DIR}/")
+
+    # Pre-aggregated (state, district, pincode, month) cubes: every report
+    # that only needs sums is served by rolling these up (see cube.py).
+    # The store keeps its cubes up to date with each ingest's delta.
+    if INCREMENTAL:
+        enrol_cube = load_store_cube('enrol')
+        demo_cube = load_store_cube('demo')
+        bio_cube = load_store_cube('bio')
+        align_categories([enrol_cube, demo_cube, bio_cube])
+    else:
+        enrol_cube = build_cube(enrol, 'enrol')
+        demo_cube = build_cube(demo, 'demo')
+        bio_cube = build_cube(bio, 'bio')
+
+for dataset, cube in (('enrol', enrol_cube), ('demo', demo_cube), ('bio', bio_cube)):
+    save_cube(cube, dataset)
+print(f"🧊 Cubes: Enrollment {len(enrol_cube):,} | Demographic {len(demo_cube):,} | Biometric {len(bio_cube):,} cells")
+
+# State / district / month / state×month / district×month sums of each
+# dataset, all rolled up from one group-by of its cube (REPORT_LEVELS in
+# cube.py). Reports read their level with grouping_level.
+enrol_levels = grouping_sets(enrol_cube)
+demo_levels = grouping_sets(demo_cube)
+bio_levels = grouping_sets(bio_cube)
+
+# State / district / month sums of the three datasets with their ratios,
+# read by the state and month age-share reports and the state and district
+# integrity checks (integrity.aggregate_integrity). After an incremental
+# ingest only the keys touched by its deltas are refreshed, provided the
+# saved aggregates match the store before it.
+AGGREGATES_DIR = os.path.join(STORE_DIR, 'aggregates')
+aggregates, versions = load_aggregates(AGGREGATES_DIR)
+if INCREMENTAL and aggregates is not None and versions == {d: c['before'] for d, c in STORE_CHANGES.items()}:
+    deltas = {d: c['delta'] for d, c in STORE_CHANGES.items() if c['delta'] is not None}
+    aggregates = refresh_aggregates(aggregates, deltas)
+    if deltas:
+        print(f"🔁 Aggregates refreshed from the deltas of {', '.join(deltas)}")
+else:
+    aggregates = build_aggregates({'enrol': enrol_cube, 'demo': demo_cube, 'bio': bio_cube})
+save_aggregates(aggregates, AGGREGATES_DIR, {d: c['after'] for d, c in STORE_CHANGES.items()} if INCREMENTAL else None)
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from integrity import integrity_table, aggregate_integrity, classify_integrity, GHOST_MIN_ENROLLMENTS, GHOST_MAX_DEMO_RATIO
+from fraud_rules import compile_rules
 
 print("="*70)
 print("🔍 CELL 13: CROSS-DATASET INTEGRITY & FRAUD DETECTION")
@@ -16,25 +18,17 @@ print("="*70)
 print("PART 1: STATE-LEVEL CROSS-DATASET ANALYSIS")
 print("="*70)
 
-# Aggregate all three datasets by state
-s_enrol = enrol.groupby('state')['total_enrol'].sum()
-s_demo = demo.groupby('state')['total_demo'].sum()
-s_bio = bio.groupby('state')['total_bio'].sum()
-
-# Create comprehensive integrity dataframe
-integrity = pd.DataFrame({
-    'Enrollments': s_enrol,
-    'Demographic_Updates': s_demo,
-    'Biometric_Updates': s_bio
-}).fillna(0)
-
-# Calculate total activity FIRST (before sorting)
-integrity['Total_Activity'] = integrity['Enrollments'] + integrity['Demographic_Updates'] + integrity['Biometric_Updates']
-
-# Calculate ratios
-integrity['Demo_to_Enrol_Ratio'] = (integrity['Demographic_Updates'] / integrity['Enrollments']).replace([np.inf, -np.inf], 0)
-integrity['Bio_to_Enrol_Ratio'] = (integrity['Biometric_Updates'] / integrity['Enrollments']).replace([np.inf, -np.inf], 0)
-integrity['Bio_to_Demo_Ratio'] = (integrity['Biometric_Updates'] / integrity['Demographic_Updates']).replace([np.inf, -np.inf], 0)
+# State totals of all three datasets with their safe ratios, read from the
+# aggregates (features.py): a state missing from a dataset counts 0, x/0 gives 0
+integrity = aggregate_integrity(aggregates['state']).set_index('state').rename(columns={
+    'enrollments': 'Enrollments',
+    'demographic_updates': 'Demographic_Updates',
+    'biometric_updates': 'Biometric_Updates',
+    'total_activity': 'Total_Activity',
+    'demo_ratio': 'Demo_to_Enrol_Ratio',
+    'bio_ratio': 'Bio_to_Enrol_Ratio',
+    'bio_demo_ratio': 'Bio_to_Demo_Ratio',
+})
 
 # NOW sort by total activity
 integrity = integrity.sort_values('Total_Activity', ascending=False)
@@ -49,52 +43,31 @@ print("\n" + "="*70)
 print("PART 2: FRAUD PATTERN IDENTIFICATION")
 print("="*70)
 
-# Define fraud patterns
-fraud_patterns = []
-
-# Pattern 1: Ghost Enrollments (High enrollment, low/no updates)
-ghost_states = integrity[
-    (integrity['Enrollments'] > 1000) & 
-    (integrity['Demo_to_Enrol_Ratio'] < 0.3)
-].copy()
-if len(ghost_states) > 0:
-    ghost_states['Fraud_Type'] = 'Ghost Enrollments (Low Updates)'
-    fraud_patterns.append(ghost_states)
-
-# Pattern 2: Phantom Updates (High updates, low/no enrollment)
-phantom_states = integrity[
-    (integrity['Demographic_Updates'] > 1000) & 
-    (integrity['Demo_to_Enrol_Ratio'] > 10)
-].copy()
-if len(phantom_states) > 0:
-    phantom_states['Fraud_Type'] = 'Phantom Updates (No New Enrollments)'
-    fraud_patterns.append(phantom_states)
-
-# Pattern 3: Biometric Mismatch (Bio vs Demo don't align)
-bio_mismatch = integrity[
-    (integrity['Biometric_Updates'] > 1000) & 
-    (abs(integrity['Bio_to_Demo_Ratio'] - 1.0) > 0.5)
-].copy()
-if len(bio_mismatch) > 0:
-    bio_mismatch['Fraud_Type'] = 'Biometric-Demographic Mismatch'
-    fraud_patterns.append(bio_mismatch)
-
-# Pattern 4: Complete Disconnect (All three datasets don't correlate)
-disconnect_states = integrity[
-    (integrity['Total_Activity'] > 5000) &
-    ((integrity['Demo_to_Enrol_Ratio'] < 0.2) | (integrity['Demo_to_Enrol_Ratio'] > 5)) &
-    ((integrity['Bio_to_Demo_Ratio'] < 0.5) | (integrity['Bio_to_Demo_Ratio'] > 2))
-].copy()
-if len(disconnect_states) > 0:
-    disconnect_states['Fraud_Type'] = 'Complete System Disconnect'
-    fraud_patterns.append(disconnect_states)
-
-# Combine all fraud patterns (only if we have any)
-if len(fraud_patterns) > 0:
-    all_fraud = pd.concat(fraud_patterns, ignore_index=False)
-    all_fraud = all_fraud[~all_fraud.index.duplicated(keep='first')]  # Remove duplicates
-else:
-    all_fraud = pd.DataFrame()  # Empty dataframe
+# Fraud patterns as expressions over the integrity columns (fraud_rules.py);
+# all of them are evaluated in one pass and every rule that fires is kept
+FRAUD_RULES = {
+    # Pattern 1: Ghost Enrollments (High enrollment, low/no updates)
+    'Ghost Enrollments (Low Updates)':
+        'Enrollments > 1000 and Demo_to_Enrol_Ratio < 0.3',
+    # Pattern 2: Phantom Updates (High updates, low/no enrollment)
+    'Phantom Updates (No New Enrollments)':
+        'Demographic_Updates > 1000 and Demo_to_Enrol_Ratio > 10',
+    # Pattern 3: Biometric Mismatch (Bio vs Demo don't align)
+    'Biometric-Demographic Mismatch':
+        'Biometric_Updates > 1000 and abs(Bio_to_Demo_Ratio - 1.0) > 0.5',
+    # Pattern 4: Complete Disconnect (All three datasets don't correlate)
+    'Complete System Disconnect':
+        'Total_Activity > 5000'
+        ' and (Demo_to_Enrol_Ratio < 0.2 or Demo_to_Enrol_Ratio > 5)'
+        ' and (Bio_to_Demo_Ratio < 0.5 or Bio_to_Demo_Ratio > 2)',
+}
+fraud_rules = compile_rules(FRAUD_RULES)
+fraud_fired = fraud_rules.evaluate(integrity)
+
+# Flagged states with Fraud_Type (first rule fired) and Fraud_Types (all)
+all_fraud = fraud_rules.flag(integrity, fraud_fired)
+fraud_counts = fraud_rules.counts(fraud_fired)
+fraud_counts = fraud_counts[fraud_counts > 0].sort_values(ascending=False, kind='stable')
 
 print(f"\n🚨 FRAUD PATTERNS DETECTED: {len(all_fraud)} states flagged\n")
 
@@ -103,7 +76,7 @@ if len(all_fraud) > 0:
     # FIX APPLIED HERE: Sort first, then select columns
     display(all_fraud.sort_values('Total_Activity', ascending=False)[[
         'Enrollments', 'Demographic_Updates', 'Biometric_Updates', 
-        'Demo_to_Enrol_Ratio', 'Bio_to_Enrol_Ratio', 'Fraud_Type'
+        'Demo_to_Enrol_Ratio', 'Bio_to_Enrol_Ratio', 'Fraud_Types'
     ]])
 else:
     print("✅ No major fraud patterns detected at state level.")
@@ -115,32 +88,12 @@ print("\n" + "="*70)
 print("PART 3: DISTRICT-LEVEL FRAUD CHECK (Ghost Districts)")
 print("="*70)
 
-# Aggregate by district
-d_enrol = enrol.groupby(['state', 'district'])['total_enrol'].sum().reset_index()
-d_demo = demo.groupby(['state', 'district'])['total_demo'].sum().reset_index()
-d_bio = bio.groupby(['state', 'district'])['total_bio'].sum().reset_index()
-
-# Merge all three
-district_integrity = d_enrol.merge(d_demo, on=['state', 'district'], how='outer', suffixes=('_enrol', '_demo'))
-district_integrity = district_integrity.merge(d_bio, on=['state', 'district'], how='outer')
-district_integrity = district_integrity.fillna(0)
-
-# Rename columns
-district_integrity.columns = ['state', 'district', 'enrollments', 'demographic_updates', 'biometric_updates']
-
-# Calculate ratios (handle division by zero)
-district_integrity['demo_ratio'] = district_integrity.apply(
-    lambda x: x['demographic_updates'] / x['enrollments'] if x['enrollments'] > 0 else 0, axis=1
-)
-district_integrity['bio_ratio'] = district_integrity.apply(
-    lambda x: x['biometric_updates'] / x['enrollments'] if x['enrollments'] > 0 else 0, axis=1
-)
-
-# Find ghost districts (enrollment > 100 but ratio < 0.1)
-ghost_districts = district_integrity[
-    (district_integrity['enrollments'] > 100) & 
-    (district_integrity['demo_ratio'] < 0.1)
-].sort_values('enrollments', ascending=False)
+# Same table at district granularity: enrollments, demographic_updates,
+# biometric_updates, demo_ratio and bio_ratio (0 where enrollments == 0)
+district_integrity = classify_integrity(aggregate_integrity(aggregates['district']))
+
+# Ghost districts (enrollment > 100 but ratio < 0.1)
+ghost_districts = district_integrity[district_integrity['status'] == 'ghost'].sort_values('enrollments', ascending=False)
 
 print(f"\n🚨 GHOST DISTRICTS DETECTED: {len(ghost_districts)}")
 print("   (High enrollments but almost NO demographic updates = suspicious)\n")
@@ -149,12 +102,8 @@ if len(ghost_districts) > 0:
     print("📋 TOP 20 GHOST DISTRICTS:")
     display(ghost_districts[['state', 'district', 'enrollments', 'demographic_updates', 'demo_ratio']].head(20))
 
-# Find dead districts (zero activity across all datasets)
-dead_districts = district_integrity[
-    (district_integrity['enrollments'] == 0) & 
-    (district_integrity['demographic_updates'] == 0) & 
-    (district_integrity['biometric_updates'] == 0)
-]
+# Dead districts (zero activity across all datasets)
+dead_districts = district_integrity[district_integrity['status'] == 'dead']
 
 print(f"\n💀 COMPLETELY DEAD DISTRICTS: {len(dead_districts)}")
 print("   (Zero activity across all three datasets = service delivery failure)\n")
@@ -166,6 +115,33 @@ elif len(dead_districts) > 20:
     print(f"📋 Sample of DEAD DISTRICTS (showing first 20 of {len(dead_districts)}):")
     display(dead_districts[['state', 'district']].head(20))
 
+# ===================================================================
+# PART 3B: PINCODE-LEVEL INTEGRITY
+# ===================================================================
+print("\n" + "="*70)
+print("PART 3B: PINCODE-LEVEL INTEGRITY (Ghost / Dead Pincodes)")
+print("="*70)
+
+# Same ratios and classification per pincode and per pincode × month,
+# sort-merge joined on the integer pincode / month keys
+integrity_cubes = {'enrol': enrol_cube, 'demo': demo_cube, 'bio': bio_cube}
+pincode_integrity = classify_integrity(integrity_table(integrity_cubes, ['pincode']))
+pincode_month_integrity = classify_integrity(integrity_table(integrity_cubes, ['pincode', 'year_month']))
+
+ghost_pincodes = pincode_integrity[pincode_integrity['status'] == 'ghost'].sort_values('enrollments', ascending=False)
+dead_pincodes = pincode_integrity[pincode_integrity['status'] == 'dead']
+ghost_pincode_months = pincode_month_integrity[pincode_month_integrity['status'] == 'ghost']
+
+print(f"\n📮 Pincodes analyzed: {len(pincode_integrity):,} | Pincode-months: {len(pincode_month_integrity):,}")
+print(f"🚨 GHOST PINCODES (enrollments > {GHOST_MIN_ENROLLMENTS}, demo_ratio < {GHOST_MAX_DEMO_RATIO}): {len(ghost_pincodes):,}")
+print(f"🚨 GHOST PINCODE-MONTHS: {len(ghost_pincode_months):,} "
+      f"in {ghost_pincode_months['pincode'].nunique():,} pincodes")
+print(f"💀 DEAD PINCODES: {len(dead_pincodes):,}")
+
+if len(ghost_pincodes) > 0:
+    print("\n📋 TOP 20 GHOST PINCODES:")
+    display(ghost_pincodes[['pincode', 'enrollments', 'demographic_updates', 'biometric_updates', 'demo_ratio']].head(20))
+
 # ===================================================================
 # PART 4: VISUALIZATIONS
 # ===================================================================
@@ -222,7 +198,7 @@ ax3.grid(alpha=0.3)
 # Chart 4: Fraud type breakdown
 ax4 = axes[1, 1]
 if len(all_fraud) > 0:
-    fraud_counts = all_fraud['Fraud_Type'].value_counts()
+    # States per pattern; a state counts for every pattern it matches
     colors_fraud = ['#ff6b6b', '#ee5a6f', '#c44569', '#774c60']
     fraud_counts.plot(kind='barh', ax=ax4, color=colors_fraud[:len(fraud_counts)], edgecolor='black')
     ax4.set_xlabel('Number of States', fontweight='bold')
@@ -251,6 +227,7 @@ print(f"   • Total states analyzed: {len(integrity)}")
 print(f"   • States flagged for fraud patterns: {len(all_fraud)}")
 print(f"   • Ghost districts (high enrol, low updates): {len(ghost_districts)}")
 print(f"   • Dead districts (zero activity): {len(dead_districts)}")
+print(f"   • Ghost pincodes: {len(ghost_pincodes):,} of {len(pincode_integrity):,}")
 
 print(f"\n📈 RATIO STATISTICS:")
 print(f"   • Mean Demo/Enrol ratio: {integrity['Demo_to_Enrol_Ratio'].mean():.2f}")
@@ -261,7 +238,7 @@ print(f"   • States with ratio >5 (stagnation): {len(integrity[integrity['Demo
 print(f"\n💡 KEY INSIGHTS:")
 if len(all_fraud) > 0:
     print(f"   🚨 {len(all_fraud)} states show suspicious cross-dataset patterns")
-    most_common_fraud = all_fraud['Fraud_Type'].value_counts().index[0]
+    most_common_fraud = fraud_counts.index[0]
     print(f"   🚨 Primary fraud type: {most_common_fraud}")
 else:
     print(f"   ✅ State-level data integrity appears normal")
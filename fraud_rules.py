@@ -0,0 +1,193 @@
+"""Fraud patterns declared as expressions and evaluated in one pass.
+
+A rule is a boolean expression over the columns of a table (an integrity
+table of integrity.py, enrollment records), written like a pandas filter
+without the df[...]:
+
+    rules = compile_rules({
+        'Ghost Enrollments (Low Updates)': 'Enrollments > 1000 and Demo_to_Enrol_Ratio < 0.3',
+        'Biometric-Demographic Mismatch': 'Biometric_Updates > 1000 and abs(Bio_to_Demo_Ratio - 1) > 0.5',
+    })
+    fired = rules.evaluate(integrity)    # bool matrix, one column per rule
+    flagged = rules.flag(integrity)      # + Fraud_Mask, Fraud_Type, Fraud_Types
+
+Expressions support comparisons (chained too), and/or/not (or &, |, ~),
++ - * /, abs() and numeric constants. compile_rules turns all of them into
+one program in which every distinct subexpression is a single step:
+a comparison shared by fifty rules is computed once, and each step works
+on whole columns, so no rule copies or filters the table.
+"""
+import ast
+import operator
+
+import numpy as np
+import pandas as pd
+
+COMPARISONS = {
+    ast.Gt: operator.gt, ast.GtE: operator.ge, ast.Lt: operator.lt,
+    ast.LtE: operator.le, ast.Eq: operator.eq, ast.NotEq: operator.ne,
+}
+ARITHMETIC = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.BitAnd: np.logical_and, ast.BitOr: np.logical_or,
+}
+FUNCTIONS = {'abs': np.abs}
+
+
+class RuleSet:
+    """Rules compiled into one program of shared, column-wise steps.
+
+    Every step is (function, argument steps), or (None, column name) for a
+    column load; steps only refer to earlier ones, so the program runs in
+    order, once per table.
+    """
+
+    def __init__(self, rules):
+        self.names = list(rules)
+        self.expressions = [rules[name] for name in self.names]
+        self.steps = []
+        self.step_ids = {}
+        self.outputs = [self.compile(ast.parse(expr, mode='eval').body, expr) for expr in self.expressions]
+
+    def __len__(self):
+        return len(self.names)
+
+    def add_step(self, key, function, args):
+        if key not in self.step_ids:
+            self.step_ids[key] = len(self.steps)
+            self.steps.append((function, args))
+        return self.step_ids[key]
+
+    def compile(self, node, expr):
+        if isinstance(node, ast.Name):
+            return self.add_step(('column', node.id), None, node.id)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            value = node.value
+            return self.add_step(('constant', value), lambda: value, ())
+        if isinstance(node, ast.Compare):
+            # a < b < c -> (a < b) & (b < c)
+            operands = [self.compile(operand, expr) for operand in [node.left, *node.comparators]]
+            parts = [
+                self.binary(COMPARISONS, type(op), left, right, expr)
+                for op, left, right in zip(node.ops, operands[:-1], operands[1:])
+            ]
+            return self.reduce(np.logical_and, parts)
+        if isinstance(node, ast.BoolOp):
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            return self.reduce(combine, [self.compile(value, expr) for value in node.values])
+        if isinstance(node, ast.BinOp):
+            left, right = self.compile(node.left, expr), self.compile(node.right, expr)
+            return self.binary(ARITHMETIC, type(node.op), left, right, expr)
+        if isinstance(node, ast.UnaryOp):
+            operand = self.compile(node.operand, expr)
+            if isinstance(node.op, (ast.Not, ast.Invert)):
+                return self.add_step(('not', operand), np.logical_not, (operand,))
+            if isinstance(node.op, ast.USub):
+                return self.add_step(('neg', operand), operator.neg, (operand,))
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS
+                and len(node.args) == 1 and not node.keywords):
+            operand = self.compile(node.args[0], expr)
+            return self.add_step((node.func.id, operand), FUNCTIONS[node.func.id], (operand,))
+        raise ValueError(f"Unsupported syntax {ast.unparse(node)!r} in rule {expr!r}")
+
+    def binary(self, table, op, left, right, expr):
+        if op not in table:
+            raise ValueError(f"Unsupported operator {op.__name__} in rule {expr!r}")
+        return self.add_step((op.__name__, left, right), table[op], (left, right))
+
+    def reduce(self, combine, parts):
+        result = parts[0]
+        for part in parts[1:]:
+            result = self.add_step((combine.__name__, result, part), combine, (result, part))
+        return result
+
+    @property
+    def columns(self):
+        """Columns the rules read"""
+        return sorted({args for function, args in self.steps if function is None})
+
+    def evaluate(self, df):
+        """Bool matrix (rows of df × rules), True where a rule fires"""
+        missing = [col for col in self.columns if col not in df.columns]
+        if missing:
+            raise KeyError(f"Rules read columns missing from the table: {missing}")
+        values = []
+        for function, args in self.steps:
+            if function is None:
+                values.append(df[args].to_numpy())
+            else:
+                values.append(function(*(values[arg] for arg in args)))
+        fired = np.empty((len(df), len(self)), dtype=bool)
+        for i, output in enumerate(self.outputs):
+            # A rule of constants only gives a scalar; broadcast it
+            fired[:, i] = values[output]
+        return fired
+
+    def labels(self, fired, sep=', ', none=''):
+        """Comma-joined names of the rules fired per row (`none` if none).
+
+        Rows are grouped by their packed bitmask and each distinct
+        combination is joined only once.
+        """
+        masks, inverse = np.unique(pack_rules(fired), axis=0, return_inverse=True)
+        combos = unpack_rules(masks, len(self))
+        names = np.array(
+            [sep.join(name for name, hit in zip(self.names, combo) if hit) or none for combo in combos],
+            dtype=object,
+        )
+        return names[inverse.reshape(-1)]
+
+    def decode(self, masks, sep=', ', none=''):
+        """labels() of rule_mask values"""
+        masks = np.asarray(masks).astype('uint64')
+        fired = (masks[:, None] >> np.arange(len(self), dtype='uint64')) & np.uint64(1)
+        return self.labels(fired.astype(bool), sep, none)
+
+    def flag(self, df, fired=None):
+        """Rows of df where any rule fires, with their rules.
+
+        Fraud_Mask: the fired rules as bits (rule i -> bit i, see
+        rule_mask), for up to 64 rules; Fraud_Type: the first rule fired,
+        in declaration order; Fraud_Types: all of them, comma-joined.
+        """
+        if fired is None:
+            fired = self.evaluate(df)
+        hit = fired.any(axis=1)
+        fired = fired[hit]
+        flagged = df[hit].copy()
+        if len(self) <= 64:
+            flagged['Fraud_Mask'] = rule_mask(fired)
+        flagged['Fraud_Type'] = np.array(self.names, dtype=object)[fired.argmax(axis=1)]
+        flagged['Fraud_Types'] = self.labels(fired)
+        return flagged
+
+    def counts(self, fired):
+        """Rows each rule fires on, in declaration order"""
+        return pd.Series(fired.sum(axis=0), index=self.names)
+
+
+def compile_rules(rules):
+    """RuleSet of {name: expression}"""
+    return RuleSet(rules)
+
+
+def pack_rules(fired):
+    """Bool matrix -> packed bits, one uint8 per 8 rules (rule i -> bit i % 8 of byte i // 8)"""
+    return np.packbits(fired, axis=1, bitorder='little')
+
+
+def unpack_rules(packed, n_rules):
+    return np.unpackbits(packed, axis=1, count=n_rules, bitorder='little').astype(bool)
+
+
+def rule_mask(fired):
+    """Packed bits of up to 64 rules as one unsigned integer per row.
+
+    The integer is as narrow as the rules allow: uint8 for up to 8 rules,
+    uint16 for 16, and so on.
+    """
+    packed = pack_rules(fired)
+    width = next(size for size in (1, 2, 4, 8) if size >= packed.shape[1])
+    padded = np.zeros((len(packed), width), dtype='uint8')
+    padded[:, :packed.shape[1]] = packed
+    return padded.view(f'<u{width}').reshape(-1)
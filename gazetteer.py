@@ -0,0 +1,163 @@
+"""Reference gazetteer of canonical state/district names.
+
+Replaces the hand-written state_mapping/district_mapping dictionaries of
+clean_dataframe. Names are resolved in this order:
+
+1. exact match on a spacing/punctuation-insensitive key, against the
+   canonical names and then the explicit aliases
+   (datasets/gazetteer_aliases.csv: legacy names, 'Wb', 'Gurgaon', ...);
+   'Jammu&Kashmir' == 'Jammu And Kashmir'
+2. fuzzy match: candidates sharing character trigrams are pulled from an
+   inverted index and the best one is accepted if its similarity is at
+   least `min_score`
+
+datasets/gazetteer.csv lists the states/UTs and every district of the
+LGD district master under its state. Districts and district aliases are
+only matched within their own state (or entries with no state), so
+same-named districts of different states (Aurangabad, Bilaspur, ...)
+stay apart and 'Bijapur' is only renamed to Vijayapura in Karnataka.
+Names that match nothing are kept as they are.
+Every resolution is memoized and the memo is saved to disk, so a name
+is only looked up once across runs.
+"""
+import os
+import re
+import json
+import hashlib
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+DATASETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datasets')
+GAZETTEER_PATH = os.path.join(DATASETS_DIR, 'gazetteer.csv')
+ALIASES_PATH = os.path.join(DATASETS_DIR, 'gazetteer_aliases.csv')
+MEMO_PATH = os.path.join('cache', 'gazetteer_memo.json')
+
+
+def name_key(name):
+    """Lower-case key without spaces or punctuation ('&' counts as 'and')"""
+    return re.sub(r'[^a-z0-9]', '', name.lower().replace('&', 'and'))
+
+
+def trigrams(key):
+    padded = f'^{key}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Canonical names of one level (state or district) with a trigram index.
+
+    Aliases, (alias, canonical name, parent) triples, are indexed too, so
+    a misspelt alias ('Pondichery') still resolves to its canonical name.
+    Canonical names win over aliases with the same key.
+    """
+
+    def __init__(self, names, parents=None, aliases=(), min_score=0.85, max_candidates=5):
+        aliases = list(aliases)
+        parents = list(parents) if parents is not None else [''] * len(names)
+        self.names = list(names) + [name for _, name, _ in aliases]
+        self.parents = parents + [parent for _, _, parent in aliases]
+        self.keys = [name_key(name) for name in list(names) + [alias for alias, _, _ in aliases]]
+        self.grams = [trigrams(key) for key in self.keys]
+        self.min_score = min_score
+        self.max_candidates = max_candidates
+
+        self.by_key = {}
+        self.postings = defaultdict(list)
+        for i, (key, parent) in enumerate(zip(self.keys, self.parents)):
+            self.by_key.setdefault((parent, key), i)
+            for gram in self.grams[i]:
+                self.postings[gram].append(i)
+
+    def in_scope(self, i, parent):
+        return self.parents[i] in ('', parent)
+
+    def lookup(self, name, parent=''):
+        """Canonical name for `name`, or None if nothing is close enough"""
+        key = name_key(name)
+        for scope in (parent, ''):
+            if (scope, key) in self.by_key:
+                return self.names[self.by_key[(scope, key)]]
+
+        # Count shared trigrams with every indexed name in scope
+        query = trigrams(key)
+        shared = defaultdict(int)
+        for gram in query:
+            for i in self.postings.get(gram, ()):
+                shared[i] += 1
+        dice = {
+            i: 2 * n / (len(query) + len(self.grams[i]))
+            for i, n in shared.items() if self.in_scope(i, parent)
+        }
+        best, best_score = None, self.min_score
+        for i in sorted(dice, key=dice.get, reverse=True)[:self.max_candidates]:
+            score = SequenceMatcher(None, key, self.keys[i]).ratio()
+            if score >= best_score:
+                best, best_score = self.names[i], score
+        return best
+
+
+class Gazetteer:
+    def __init__(self, entries, aliases, min_score=0.85, memo_path=MEMO_PATH, version=''):
+        states = entries[entries['level'] == 'state']
+        districts = entries[entries['level'] == 'district']
+        alias_map = {
+            level: list(zip(group['alias'], group['name'], group['parent']))
+            for level, group in aliases.groupby('level')
+        }
+        self.states = NameIndex(states['name'], aliases=alias_map.get('state', ()), min_score=min_score)
+        self.districts = NameIndex(
+            districts['name'], districts['parent'], aliases=alias_map.get('district', ()), min_score=min_score
+        )
+        self.memo_path = memo_path
+        self.version = version
+        self.memo = {'version': version, 'state': {}, 'district': {}}
+        if memo_path and os.path.exists(memo_path):
+            with open(memo_path) as f:
+                memo = json.load(f)
+            if memo.get('version') == version:
+                self.memo = memo
+        self.dirty = False
+
+    def resolve_state(self, name):
+        memo = self.memo['state']
+        if name not in memo:
+            memo[name] = self.states.lookup(name)
+            self.dirty = True
+        return memo[name] or name
+
+    def resolve_district(self, name, state):
+        memo = self.memo['district']
+        memo_key = f'{state}|{name}'
+        if memo_key not in memo:
+            memo[memo_key] = self.districts.lookup(name, state)
+            self.dirty = True
+        return memo[memo_key] or name
+
+    def unresolved(self, level):
+        """Names seen so far that matched nothing in the gazetteer"""
+        return sorted(name for name, match in self.memo[level].items() if match is None)
+
+    def save_memo(self):
+        if not (self.dirty and self.memo_path):
+            return
+        os.makedirs(os.path.dirname(self.memo_path), exist_ok=True)
+        tmp_path = self.memo_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.memo, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.memo_path)
+        self.dirty = False
+
+
+def load_gazetteer(path=GAZETTEER_PATH, aliases_path=ALIASES_PATH, min_score=0.85, memo_path=MEMO_PATH):
+    """Build the resolver; the memo is discarded whenever either CSV or min_score changes"""
+    h = hashlib.blake2b(digest_size=8)
+    for p in (path, aliases_path):
+        with open(p, 'rb') as f:
+            h.update(f.read())
+    h.update(str(min_score).encode())
+
+    entries = pd.read_csv(path, dtype=str, keep_default_na=False)
+    aliases = pd.read_csv(aliases_path, dtype=str, keep_default_na=False)
+    return Gazetteer(entries, aliases, min_score=min_score, memo_path=memo_path, version=h.hexdigest())
@@ -0,0 +1,154 @@
+"""Cross-dataset integrity tables at any granularity.
+
+Enrollments, demographic and biometric updates are summed per key from
+the cubes (see cube.py) and aligned on integer codes instead of joined on
+strings:
+
+    integrity_table(cubes, ['state', 'district'])
+    integrity_table(cubes, ['pincode', 'year_month'])
+    classify_integrity(table)   # + status: normal / ghost / dead
+    aggregate_integrity(aggregates['district'])   # same, from the aggregates
+
+Every key is mapped to a code shared by the three datasets (the union of
+their categories for state/district, the value itself for pincode and
+month_key) and the codes are packed into one int64 per cube cell. The
+totals are then summed with np.bincount and every ratio is a vectorized
+safe division, so a table costs a few array passes over the cubes
+whatever the granularity. Pincode keys are too sparse for a dense
+lookup; their tables are sort-merge joined on the packed keys instead.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from cube import CUBE_TOTALS, safe_divide
+from feature_registry import year_month_labels
+
+# dataset -> integrity column holding its total
+INTEGRITY_COLUMNS = {'enrol': 'enrollments', 'demo': 'demographic_updates', 'bio': 'biometric_updates'}
+# ratio -> (numerator, denominator); x/0 and 0/0 both give 0
+INTEGRITY_RATIOS = {
+    'demo_ratio': ('demographic_updates', 'enrollments'),
+    'bio_ratio': ('biometric_updates', 'enrollments'),
+    'bio_demo_ratio': ('biometric_updates', 'demographic_updates'),
+}
+# Integrity ratio -> its column in the aggregates (cube.py RATIOS)
+AGGREGATE_RATIOS = {
+    'demo_ratio': 'Demo_to_Enrol_Ratio',
+    'bio_ratio': 'Bio_to_Enrol_Ratio',
+    'bio_demo_ratio': 'Bio_to_Demo_Ratio',
+}
+# Ghost: high enrollments with almost no demographic updates
+GHOST_MIN_ENROLLMENTS = 100
+GHOST_MAX_DEMO_RATIO = 0.1
+INTEGRITY_STATUS = ['normal', 'ghost', 'dead']
+
+
+def shared_codes(columns):
+    """Integer codes of the same key in several frames, comparable across them.
+
+    Returns (codes per column, categories or None for integer keys).
+    """
+    if isinstance(columns[0].dtype, pd.CategoricalDtype):
+        categories = union_categoricals(columns, sort_categories=True).categories
+        codes = [
+            categories.get_indexer(col.cat.categories)[col.cat.codes.to_numpy()].astype('int64')
+            for col in columns
+        ]
+        return codes, categories
+    return [col.to_numpy().astype('int64') for col in columns], None
+
+
+def integrity_table(cubes, by):
+    """Totals of every dataset in {dataset: cube} per `by`, with their ratios.
+
+    `by` is any combination of state, district, pincode, month_key and
+    year_month (month_key plus its 'YYYY-MM' label). Keys missing from a
+    dataset get a total of 0.
+    """
+    keys = list(dict.fromkeys('month_key' if key == 'year_month' else key for key in by))
+    datasets = list(cubes)
+
+    # Pack the shared codes of all keys into one int64 (mixed radix)
+    packed = [np.zeros(len(cubes[dataset]), dtype='int64') for dataset in datasets]
+    decode = []
+    space = 1
+    for key in keys:
+        codes, categories = shared_codes([cubes[dataset][key] for dataset in datasets])
+        low = min((c.min() for c in codes if len(c)), default=0)
+        radix = max((c.max() for c in codes if len(c)), default=0) - low + 1
+        packed = [p * radix + (c - low) for p, c in zip(packed, codes)]
+        decode.append((key, low, radix, categories))
+        space *= int(radix)
+
+    n_cells = sum(len(p) for p in packed)
+    if space <= max(4 * n_cells, 1 << 20):
+        # Small key space (states, districts, months): dense lookup, no sort
+        present = np.bincount(np.concatenate(packed), minlength=space) > 0
+        unique = np.flatnonzero(present)
+        position = np.cumsum(present) - 1
+        inverses = [position[p] for p in packed]
+    else:
+        # Large key space (pincode, pincode x month): sort-merge join. Each
+        # dataset's keys are sorted and deduplicated on their own, the sorted
+        # key lists are merged and every dataset finds its keys in the
+        # merged list by binary search.
+        dataset_keys = [np.unique(p, return_inverse=True) for p in packed]
+        unique = np.unique(np.concatenate([keys for keys, _ in dataset_keys]))
+        inverses = [np.searchsorted(unique, keys)[inverse.reshape(-1)] for keys, inverse in dataset_keys]
+
+    table = {}
+    remainder = unique
+    for key, low, radix, categories in reversed(decode):
+        remainder, codes = np.divmod(remainder, radix)
+        codes = codes + low
+        table[key] = pd.Categorical.from_codes(codes, categories=categories) if categories is not None else codes
+    table = pd.DataFrame({key: table[key] for key in keys})
+    if 'pincode' in table:
+        table['pincode'] = table['pincode'].astype(cubes[datasets[0]]['pincode'].dtype)
+    if 'month_key' in table:
+        table['month_key'] = table['month_key'].astype(cubes[datasets[0]]['month_key'].dtype)
+        if 'year_month' in by:
+            table['year_month'] = year_month_labels(table)
+
+    for dataset, inverse in zip(datasets, inverses):
+        totals = cubes[dataset][CUBE_TOTALS[dataset]].to_numpy()
+        sums = np.bincount(inverse, weights=totals, minlength=len(unique))
+        table[INTEGRITY_COLUMNS[dataset]] = sums.astype('int64')
+
+    measures = [INTEGRITY_COLUMNS[dataset] for dataset in datasets]
+    table['total_activity'] = table[measures].sum(axis=1)
+    for name, (numerator, denominator) in INTEGRITY_RATIOS.items():
+        if numerator in table and denominator in table:
+            table[name] = safe_divide(table[numerator], table[denominator])
+    return table
+
+
+def aggregate_integrity(aggregate):
+    """integrity_table of one level of the aggregates (cube.build_aggregates).
+
+    The aggregates are kept up to date from each ingest's deltas, so the
+    totals and ratios are read rather than summed from the cubes again.
+    Keys are the aggregates' plain strings, in sorted order.
+    """
+    table = aggregate.sort_index().reset_index()
+    for dataset, column in INTEGRITY_COLUMNS.items():
+        table[column] = table[CUBE_TOTALS[dataset]].astype('int64')
+    table['total_activity'] = table[list(INTEGRITY_COLUMNS.values())].sum(axis=1)
+    for name, column in AGGREGATE_RATIOS.items():
+        table[name] = table[column]
+    keys = list(aggregate.index.names)
+    return table[keys + list(INTEGRITY_COLUMNS.values()) + ['total_activity', *AGGREGATE_RATIOS]]
+
+
+def classify_integrity(table):
+    """Add `status` to an integrity table of all three datasets.
+
+    ghost: more than GHOST_MIN_ENROLLMENTS enrollments but a demo_ratio
+    below GHOST_MAX_DEMO_RATIO; dead: no activity in any dataset.
+    """
+    ghost = (table['enrollments'] > GHOST_MIN_ENROLLMENTS) & (table['demo_ratio'] < GHOST_MAX_DEMO_RATIO)
+    dead = (table[list(INTEGRITY_COLUMNS.values())] == 0).all(axis=1)
+    status = np.select([dead, ghost], ['dead', 'ghost'], 'normal')
+    table['status'] = pd.Categorical(status, categories=INTEGRITY_STATUS)
+    return table
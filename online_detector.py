@@ -0,0 +1,160 @@
+"""Online anomaly detection for the daily enrollment feed.
+
+The Isolation Forest of ML_analysis.py needs all records up front. Here
+records are scored as they arrive with streaming Half-Space Trees (Tan,
+Ting & Liu, 2011) and the detector learns from them as it goes, holding
+no history beyond one window:
+
+    detector = HalfSpaceTrees(n_features=len(feature_cols))
+    scores, flags = detector.score_update(X_day)   # then X_day2, ...
+
+Each tree halves random feature ranges down to a fixed depth. A record's
+score is the mass (records seen per node) along its path, in the
+reference window, scaled by the node depth; sparse regions score low.
+Every `window_size` records the window just filled becomes the reference
+and the flag threshold is reset to its `contamination` score quantile.
+A record costs n_trees * (depth + 1) node visits whatever the history,
+and memory is fixed by the trees and the paths of one window.
+
+The first window only fixes the feature ranges and fills the first
+reference, so its records are returned unscored (NaN, not flagged).
+Records of one call are processed together, with the same result as one
+at a time.
+"""
+import numpy as np
+
+
+class HalfSpaceTrees:
+    """Streaming Half-Space Trees; lower scores are more anomalous."""
+
+    def __init__(self, n_features, n_trees=25, depth=10, window_size=2500, contamination=0.005,
+                 size_limit=None, random_state=42):
+        self.n_features = n_features
+        self.n_trees = n_trees
+        self.depth = depth
+        self.window_size = window_size
+        self.contamination = contamination
+        # Nodes holding less reference mass than this end a record's path
+        self.size_limit = 0.1 * window_size if size_limit is None else size_limit
+        self.rng = np.random.default_rng(random_state)
+
+        self.n_nodes = 2 ** (depth + 1) - 1
+        self.split_dims = None
+        self.split_values = None
+        self.reference = np.zeros((n_trees, self.n_nodes))
+        self.latest = np.zeros((n_trees, self.n_nodes))
+        # Records of the first window, then the paths of each window's records
+        self.window = np.empty((window_size, n_features))
+        self.window_nodes = np.empty((window_size, n_trees, depth + 1), dtype='int32')
+        self.filled = 0
+        self.threshold = None
+        self.records_seen = 0
+
+    @property
+    def ready(self):
+        """True once the first window has been learned and records are scored"""
+        return self.threshold is not None
+
+    def build_trees(self, X):
+        """Random half-space splits over the value ranges of the first window"""
+        self.low = X.min(axis=0)
+        span = X.max(axis=0) - self.low
+        self.span = np.where(span > 0, span, 1.0)
+
+        n_internal = 2 ** self.depth - 1
+        self.split_dims = np.zeros((self.n_trees, n_internal), dtype='int64')
+        self.split_values = np.zeros((self.n_trees, n_internal))
+        for tree in range(self.n_trees):
+            # Work range around a random point, so splits do not all fall
+            # on the same values in every tree
+            point = self.rng.uniform(size=self.n_features)
+            reach = 2 * np.maximum(point, 1 - point)
+            low = np.empty((self.n_nodes, self.n_features))
+            high = np.empty((self.n_nodes, self.n_features))
+            low[0], high[0] = point - reach, point + reach
+            for node in range(n_internal):
+                dim = self.rng.integers(self.n_features)
+                split = (low[node, dim] + high[node, dim]) / 2
+                self.split_dims[tree, node] = dim
+                self.split_values[tree, node] = split
+                for child in (2 * node + 1, 2 * node + 2):
+                    low[child], high[child] = low[node], high[node]
+                high[2 * node + 1, dim] = split
+                low[2 * node + 2, dim] = split
+
+    def paths(self, X):
+        """(records × trees × depth + 1) node of every record at every depth"""
+        X = (X - self.low) / self.span
+        # Flat indices: tree t's internal node k is t * n_internal + k
+        n_internal = self.split_dims.shape[1]
+        tree_offsets = np.arange(self.n_trees) * n_internal
+        row_offsets = np.arange(len(X))[:, None] * self.n_features
+        split_dims, split_values, values = self.split_dims.ravel(), self.split_values.ravel(), X.ravel()
+        nodes = np.zeros((len(X), self.n_trees, self.depth + 1), dtype='int32')
+        for level in range(self.depth):
+            node = nodes[:, :, level]
+            flat = tree_offsets + node
+            right = values[row_offsets + split_dims[flat]] >= split_values[flat]
+            nodes[:, :, level + 1] = 2 * node + 1 + right
+        return nodes
+
+    def mass_score(self, nodes):
+        """Reference mass × 2^depth at the node where each path stops, summed over trees"""
+        mass = self.reference[np.arange(self.n_trees)[None, :, None], nodes]
+        stop = mass < self.size_limit
+        stop[:, :, -1] = True
+        level = stop.argmax(axis=2)
+        ends = np.take_along_axis(mass, level[:, :, None], axis=2)[:, :, 0]
+        return (ends * 2.0 ** level).sum(axis=1)
+
+    def learn(self, nodes):
+        """Add the records' paths to the latest window's mass"""
+        cells = (np.arange(self.n_trees)[None, :, None] * self.n_nodes + nodes).reshape(-1)
+        if 64 * len(cells) >= self.latest.size:
+            # Large batches: one pass over every node is cheaper (np.add.at
+            # costs about as much per cell as bincount does per 64 nodes)
+            self.latest += np.bincount(cells, minlength=self.latest.size).reshape(self.latest.shape)
+        else:
+            # Only the nodes on the records' paths, whatever the tree size
+            np.add.at(self.latest.reshape(-1), cells, 1)
+
+    def end_window(self):
+        if self.split_dims is None:
+            # First window: fix the ranges and trees, then learn its records
+            self.build_trees(self.window)
+            self.window_nodes = self.paths(self.window)
+            self.learn(self.window_nodes)
+        self.reference, self.latest = self.latest, np.zeros_like(self.latest)
+        # Flag threshold: the contamination quantile of the window's own
+        # scores under its mass, so flags start with the first scored record
+        scores = self.mass_score(self.window_nodes)
+        self.threshold = np.quantile(scores, self.contamination)
+        self.filled = 0
+
+    def score_update(self, X):
+        """Score records, then learn from them; returns (scores, flags).
+
+        Scores are NaN (and flags False) while the first window fills.
+        """
+        X = np.asarray(X, dtype='float64').reshape(-1, self.n_features)
+        scores = np.full(len(X), np.nan)
+        flags = np.zeros(len(X), dtype=bool)
+        start = 0
+        while start < len(X):
+            # Never cross a window boundary: the reference changes there
+            end = min(len(X), start + self.window_size - self.filled)
+            batch = X[start:end]
+            if self.ready:
+                nodes = self.paths(batch)
+                scores[start:end] = self.mass_score(nodes)
+                flags[start:end] = scores[start:end] < self.threshold
+                self.learn(nodes)
+                self.window_nodes[self.filled:self.filled + len(batch)] = nodes
+            else:
+                self.window[self.filled:self.filled + len(batch)] = batch
+            self.filled += len(batch)
+            self.records_seen += len(batch)
+            if self.filled == self.window_size:
+                self.end_window()
+            start = end
+        return scores, flags
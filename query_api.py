@@ -0,0 +1,242 @@
+"""Ad-hoc slice queries over the persisted cubes (see cube.py).
+
+Answers questions like "enrollments by age group for Bihar districts,
+Jul-Oct" or "demo/enrol ratio for these pincodes" without touching the
+raw rows:
+
+    from query_api import query
+    query(['age_0_5', 'age_5_17', 'age_18_greater'], by='district',
+          states=['Bihar'], months=('2025-07', '2025-10'))
+    query(['Demo_to_Enrol_Ratio'], by='pincode', pincodes=[110001, 110002])
+    query(by='year_month', districts=[('Bihar', 'Aurangabad')])
+
+or from the shell:
+
+    python query_api.py --by district --state Bihar --months 2025-07 2025-10
+    python query_api.py --measures Demo_to_Enrol_Ratio --by pincode --pincode 110001 110002
+    python query_api.py --by year_month --district Bihar:Aurangabad
+
+District names are only unique within a state (Aurangabad, Bilaspur,
+Hamirpur, ...), so districts are always grouped by (state, district),
+and a district filter given by name alone must match a single district
+of the selected states.
+
+Measures are cube counts, totals, '<dataset>_rows' or any RATIOS name;
+the datasets to read follow from them. Results are kept in an LRU cache
+keyed by the query and the cube files' modification times, so repeated
+dashboard queries are answered from memory until features.py writes new
+cubes; only the latest cube of each dataset is kept loaded.
+"""
+import os
+import sys
+import time
+import argparse
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from cube import CUBE_KEYS, CUBE_MEASURES, CUBE_TOTALS, RATIOS, cube_name, load_cube, level_sums, update_ratios
+from shared_store import shared_path, SHARED_DIR
+
+QUERY_CACHE_SIZE = 256
+
+# measure -> dataset it is summed from
+MEASURE_DATASETS = {
+    col: dataset
+    for dataset in CUBE_MEASURES
+    for col in CUBE_MEASURES[dataset] + [CUBE_TOTALS[dataset], f'{dataset}_rows']
+}
+
+
+class CubeIndex:
+    """A cube sorted by its keys, with the row range of every state.
+
+    States select contiguous row ranges; districts, pincodes and months are
+    then filtered on integer codes of those rows only. Districts are
+    matched on (state, district) pair codes.
+    """
+
+    def __init__(self, cube):
+        self.cube = cube.sort_values(CUBE_KEYS, ignore_index=True)
+        self.states = self.cube['state'].cat.categories
+        self.districts = self.cube['district'].cat.categories
+        state_codes = self.cube['state'].cat.codes.to_numpy()
+        self.state_bounds = np.searchsorted(state_codes, np.arange(len(self.states) + 1))
+        self.district_codes = self.cube['district'].cat.codes.to_numpy()
+        self.pair_codes = state_codes.astype('int64') * len(self.districts) + self.district_codes
+        self.pincodes = self.cube['pincode'].to_numpy()
+        self.month_keys = self.cube['month_key'].to_numpy()
+
+    def district_pairs(self, districts, rows):
+        """Pair codes of (state, district) filters among `rows`.
+
+        A filter with no state ('' or None) matches the district in any of
+        those rows' states, and must not match more than one.
+        """
+        pairs = np.unique(self.pair_codes[rows])
+        pair_states, pair_districts = np.divmod(pairs, max(len(self.districts), 1))
+        selected = []
+        for state, district in districts:
+            match = pair_districts == self.districts.get_indexer([district])[0]
+            if state:
+                match &= pair_states == self.states.get_indexer([state])[0]
+            elif match.sum() > 1:
+                states = ', '.join(self.states[pair_states[match]])
+                raise ValueError(f"District {district!r} is in several states ({states}); "
+                                 f"give it as (state, district) or filter the states")
+            selected.append(pairs[match])
+        return np.concatenate([np.empty(0, dtype='int64'), *selected])
+
+    def select(self, states=None, districts=None, pincodes=None, month_range=None):
+        if states is None:
+            rows = np.arange(len(self.cube))
+        else:
+            codes = np.unique(self.states.get_indexer(list(states)))
+            rows = np.concatenate(
+                [np.empty(0, dtype='int64')]
+                + [np.arange(self.state_bounds[code], self.state_bounds[code + 1]) for code in codes[codes >= 0]]
+            )
+        mask = np.ones(len(rows), dtype=bool)
+        if districts is not None:
+            mask &= np.isin(self.pair_codes[rows], self.district_pairs(districts, rows))
+        if pincodes is not None:
+            mask &= np.isin(self.pincodes[rows], list(pincodes))
+        if month_range is not None:
+            first, last = month_range
+            mask &= (self.month_keys[rows] >= first) & (self.month_keys[rows] <= last)
+        return self.cube.iloc[rows[mask]]
+
+
+@lru_cache(maxsize=len(CUBE_MEASURES))
+def cube_index(dataset, shared_dir, version):
+    # `version` (the file's mtime) makes a rewritten cube load again; one
+    # entry per dataset, so superseded cubes are let go
+    return CubeIndex(load_cube(dataset, shared_dir))
+
+
+def cube_version(dataset, shared_dir):
+    return os.stat(shared_path(cube_name(dataset), shared_dir)).st_mtime_ns
+
+
+def month_key(month):
+    """'YYYY-MM' -> month_key (the ordinal of the monthly Period)"""
+    return pd.Period(month, freq='M').ordinal
+
+
+def measure_datasets(measures):
+    datasets = set()
+    for measure in measures:
+        if measure in RATIOS:
+            numerator, denominator = RATIOS[measure][:2]
+            datasets |= {MEASURE_DATASETS[numerator], MEASURE_DATASETS[denominator]}
+        elif measure in MEASURE_DATASETS:
+            datasets.add(MEASURE_DATASETS[measure])
+        else:
+            raise ValueError(f"Unknown measure {measure!r}")
+    return sorted(datasets)
+
+
+def as_key(values, cast=str):
+    """Normalize a filter to a hashable, order-independent cache key"""
+    if values is None:
+        return None
+    if np.ndim(values) == 0:
+        # One value: a str, an int or a numpy scalar such as np.int64
+        values = [values]
+    return tuple(sorted({cast(value) for value in values}))
+
+
+def district_key(district):
+    """(state, district) of a district filter; a bare name gets state ''"""
+    if isinstance(district, str):
+        return ('', district)
+    state, name = district
+    return (state or '', name)
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def cached_query(measures, by, states, districts, pincodes, month_range, shared_dir, versions):
+    datasets = measure_datasets(measures)
+    slices = {
+        dataset: cube_index(dataset, shared_dir, version).select(states, districts, pincodes, month_range)
+        for dataset, version in zip(datasets, versions)
+    }
+    table = level_sums(slices, list(by))
+    if any(measure in RATIOS for measure in measures):
+        table = update_ratios(table)
+    return table[list(measures)]
+
+
+def query(measures=None, by='state', dataset='enrol', states=None, districts=None, pincodes=None,
+          months=None, shared_dir=SHARED_DIR):
+    """Sums (and ratios) of `measures` per `by` over the selected slice.
+
+    measures: list of measures; default: the counts and total of `dataset`
+    by: key or list of keys among state, district, pincode, year_month, month_key;
+        district always comes with its state
+    states, districts, pincodes: values to keep (None keeps all); districts
+        are (state, district) pairs, or names found in one selected state only
+    months: ('YYYY-MM', 'YYYY-MM') inclusive range, or a single 'YYYY-MM'
+    """
+    if measures is None:
+        measures = CUBE_MEASURES[dataset] + [CUBE_TOTALS[dataset]]
+    measures = tuple([measures] if isinstance(measures, str) else measures)
+    by = tuple([by] if isinstance(by, str) else by)
+    if 'district' in by and 'state' not in by:
+        # Same-named districts of different states must not be summed together
+        at = by.index('district')
+        by = by[:at] + ('state',) + by[at:]
+    month_range = None
+    if months is not None:
+        first, last = (months, months) if isinstance(months, str) else months
+        month_range = (month_key(first), month_key(last))
+
+    versions = tuple(cube_version(dataset, shared_dir) for dataset in measure_datasets(measures))
+    result = cached_query(
+        measures, by, as_key(states), as_key(districts, district_key), as_key(pincodes, int), month_range,
+        shared_dir, versions,
+    )
+    # Callers get their own copy; the cached result stays untouched
+    return result.copy()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Slice queries over the aggregated enrol/demo/bio cubes")
+    parser.add_argument('--dataset', default='enrol', choices=sorted(CUBE_MEASURES),
+                        help="dataset whose counts are returned when --measures is not given")
+    parser.add_argument('--measures', nargs='+', help="counts, totals, <dataset>_rows or ratios")
+    parser.add_argument('--by', nargs='+', default=['state'],
+                        help="state, district, pincode, year_month and/or month_key")
+    parser.add_argument('--state', nargs='+', help="canonical state names")
+    parser.add_argument('--district', nargs='+', metavar='[STATE:]DISTRICT',
+                        help="canonical district names, with their state when the name is in several")
+    parser.add_argument('--pincode', nargs='+', type=int)
+    parser.add_argument('--months', nargs='+', metavar='YYYY-MM', help="one month or an inclusive range")
+    parser.add_argument('--shared-dir', default=SHARED_DIR)
+    parser.add_argument('--csv', action='store_true', help="print CSV instead of a table")
+    args = parser.parse_args(argv)
+
+    if args.months is not None and len(args.months) > 2:
+        parser.error("--months takes one month or a FROM TO range")
+
+    districts = args.district and [
+        tuple(district.split(':', 1)) if ':' in district else district for district in args.district
+    ]
+    start = time.perf_counter()
+    try:
+        result = query(
+            args.measures, args.by, args.dataset, args.state, districts, args.pincode,
+            args.months and (args.months[0], args.months[-1]), args.shared_dir,
+        )
+    except ValueError as exc:
+        # Unknown measures or keys, ambiguous district names, ...
+        parser.error(str(exc))
+    elapsed = time.perf_counter() - start
+
+    print(result.to_csv().rstrip('\n') if args.csv else result.to_string())
+    print(f"{len(result):,} rows in {elapsed * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Memory-mapped store of the cleaned datasets.
+
+features.py writes enrol/demo/bio here as uncompressed Arrow IPC files.
+Any other process (a worker, a second kernel, a script run on its own) can
+then open them without re-parsing or re-cleaning anything:
+
+    from shared_store import open_shared_tables
+    enrol, demo, bio = open_shared_tables()
+    ensure_features(enrol, 'enrol', ['total_enrol'])   # feature_registry
+
+The files are memory-mapped, so processes opening the same table share the
+same physical pages and numeric columns are not copied into each process.
+"""
+import os
+
+import pyarrow as pa
+
+# Lives next to the raw and store caches of data_loading.py
+SHARED_DIR = os.path.join('cache', 'shared')
+
+
+def shared_path(name, shared_dir=SHARED_DIR):
+    return os.path.join(shared_dir, f'{name}.arrow')
+
+
+def write_shared_table(df, name, shared_dir=SHARED_DIR):
+    """Write a DataFrame as an uncompressed (memory-mappable) Arrow IPC file"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Keep NaN as NaN instead of Arrow nulls: columns without a validity
+    # bitmap can be handed to pandas without a copy
+    for i, col in enumerate(table.column_names):
+        if df[col].dtype.kind == 'f':
+            table = table.set_column(i, col, pa.array(df[col].to_numpy()))
+
+    os.makedirs(shared_dir, exist_ok=True)
+    path = shared_path(name, shared_dir)
+    tmp_path = path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+def open_shared_arrow(name, shared_dir=SHARED_DIR):
+    """Memory-map a shared table as a pyarrow.Table (always zero-copy)"""
+    source = pa.memory_map(shared_path(name, shared_dir), 'r')
+    return pa.ipc.open_file(source).read_all()
+
+
+def open_shared_table(name, columns=None, shared_dir=SHARED_DIR):
+    """Open a shared table as a DataFrame backed by the memory map.
+
+    Numeric and datetime columns are zero-copy views of the mapped file
+    (read-only); only categorical and other extension columns are rebuilt.
+    """
+    table = open_shared_arrow(name, shared_dir)
+    if columns is not None:
+        table = table.select(columns)
+    return table.to_pandas(split_blocks=True, zero_copy_only=False)
+
+
+def open_shared_tables(names=('enrol', 'demo', 'bio'), shared_dir=SHARED_DIR):
+    return [open_shared_table(name, shared_dir=shared_dir) for name in names]
+
@@ -1,17 +1,9 @@
 print(" UNIVARIATE ANALYSIS: STATE-WISE ENROLLMENT")
 
-# Aggregate by state
-state_enrol = enrol.groupby('state').agg({
-    'total_enrol': 'sum',
-    'age_0_5': 'sum',
-    'age_5_17': 'sum',
-    'age_18_greater': 'sum'
-}).sort_values('total_enrol', ascending=False)
-
-# Calculate percentages
-state_enrol['child_pct'] = (state_enrol['age_0_5'] / state_enrol['total_enrol'] * 100).round(2)
-state_enrol['youth_pct'] = (state_enrol['age_5_17'] / state_enrol['total_enrol'] * 100).round(2)
-state_enrol['adult_pct'] = (state_enrol['age_18_greater'] / state_enrol['total_enrol'] * 100).round(2)
+# State sums and age percentages, from the aggregates (features.py)
+state_enrol = aggregates['state'][aggregates['state']['enrol_rows'] > 0][[
+    'total_enrol', 'age_0_5', 'age_5_17', 'age_18_greater', 'child_pct', 'youth_pct', 'adult_pct'
+]].sort_values('total_enrol', ascending=False)
 
 print("\n📈 TOP 15 STATES BY ENROLLMENT:")
 display(state_enrol.head(15))
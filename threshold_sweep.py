@@ -0,0 +1,175 @@
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+from integrity import GHOST_MIN_ENROLLMENTS, GHOST_MAX_DEMO_RATIO
+
+print("="*70)
+print("🎚️  THRESHOLD SENSITIVITY SWEEP")
+print("="*70)
+print("\n💡 The fraud cut-offs (enrollments > 100, demo_ratio < 0.1, ...) are")
+print("   judgement calls. Here every cut-off pair of a grid is evaluated over")
+print("   all districts at once, with how much the flagged set changes.\n")
+
+def grid_positions(values, grid, op):
+    """Per value, the grid position from which a `value op threshold` test flips.
+
+    Returns (positions, upper): with upper=True the value passes thresholds
+    grid[:position], otherwise grid[position:]. grid is sorted ascending.
+    """
+    if op == '>':
+        return np.searchsorted(grid, values, side='left'), True
+    if op == '>=':
+        return np.searchsorted(grid, values, side='right'), True
+    if op == '<':
+        return np.searchsorted(grid, values, side='right'), False
+    if op == '<=':
+        return np.searchsorted(grid, values, side='left'), False
+    raise ValueError(f"Unsupported operator {op!r}")
+
+def cumulative_counts(histogram, axis, upper):
+    """Per threshold of one axis, sum of the histogram cells that pass it"""
+    n = histogram.shape[axis] - 1
+    if upper:
+        # Pass thresholds [0, position): sum over positions > threshold index
+        suffix = np.flip(np.cumsum(np.flip(histogram, axis), axis=axis), axis)
+        return suffix.take(np.arange(1, n + 1), axis=axis)
+    return np.cumsum(histogram, axis=axis).take(np.arange(n), axis=axis)
+
+def pass_counts(x_pos, x_upper, y_pos, y_upper, nx, ny, weights=None):
+    """(nx × ny) counts of entities passing both tests, from one 2-D histogram"""
+    cells = x_pos * (ny + 1) + y_pos
+    histogram = np.bincount(cells, weights=weights, minlength=(nx + 1) * (ny + 1)).reshape(nx + 1, ny + 1)
+    return cumulative_counts(cumulative_counts(histogram, 0, x_upper), 1, y_upper)
+
+def threshold_sweep(table, x, x_op, x_grid, y, y_op, y_grid, baseline, outside=False):
+    """Flagged entities and their stability for every (x, y) threshold pair.
+
+    Entities are flagged when `x x_op tx` and `y y_op ty` (or, with
+    outside=True, when they fail either test, like a ratio outside a
+    band). Each row has the flagged count, the Jaccard similarity of the
+    flagged set to the one at `baseline`, and `stability`: the lowest
+    Jaccard similarity to the sets of the neighbouring grid pairs.
+    """
+    x_grid = np.union1d(x_grid, [baseline[0]])
+    y_grid = np.union1d(y_grid, [baseline[1]])
+    nx, ny = len(x_grid), len(y_grid)
+    x_pos, x_upper = grid_positions(table[x].to_numpy(), x_grid, x_op)
+    y_pos, y_upper = grid_positions(table[y].to_numpy(), y_grid, y_op)
+
+    passed = pass_counts(x_pos, x_upper, y_pos, y_upper, nx, ny)
+    bx, by = np.searchsorted(x_grid, baseline[0]), np.searchsorted(y_grid, baseline[1])
+    in_baseline = ((x_pos > bx) if x_upper else (x_pos <= bx)) & ((y_pos > by) if y_upper else (y_pos <= by))
+    # Entities of the baseline set that pass at every pair
+    passed_baseline = pass_counts(x_pos, x_upper, y_pos, y_upper, nx, ny, weights=in_baseline.astype(float))
+
+    if outside:
+        flagged = len(table) - passed
+        baseline_size = flagged[bx, by]
+        overlap = baseline_size - (passed - passed_baseline)
+    else:
+        flagged = passed
+        baseline_size = flagged[bx, by]
+        overlap = passed_baseline
+    union = flagged + baseline_size - overlap
+    jaccard = np.where(union > 0, overlap / np.maximum(union, 1), 1.0)
+
+    # Along either axis the flagged sets are nested, so the Jaccard similarity
+    # of neighbours is the smaller count over the larger
+    def nested_jaccard(a, b):
+        return np.where(np.maximum(a, b) > 0, np.minimum(a, b) / np.maximum(np.maximum(a, b), 1), 1.0)
+    stability = np.ones((nx, ny))
+    stability[1:, :] = np.minimum(stability[1:, :], nested_jaccard(flagged[1:, :], flagged[:-1, :]))
+    stability[:-1, :] = np.minimum(stability[:-1, :], nested_jaccard(flagged[:-1, :], flagged[1:, :]))
+    stability[:, 1:] = np.minimum(stability[:, 1:], nested_jaccard(flagged[:, 1:], flagged[:, :-1]))
+    stability[:, :-1] = np.minimum(stability[:, :-1], nested_jaccard(flagged[:, :-1], flagged[:, 1:]))
+
+    # Threshold columns are named after their test, e.g. 'enrollments >'
+    sweep = pd.DataFrame({
+        f'{x} {x_op}': np.repeat(x_grid, ny),
+        f'{y} {y_op}': np.tile(y_grid, nx),
+        'flagged': flagged.reshape(-1).astype('int64'),
+        'jaccard': jaccard.reshape(-1).round(3),
+        'stability': stability.reshape(-1).round(3),
+    })
+    sweep.attrs['baseline'] = baseline
+    return sweep
+
+def band_factor(ratio):
+    """max(ratio, 1 / ratio): the ratio is outside the band (1/f, f) when this is above f"""
+    ratio = np.asarray(ratio, dtype='float64')
+    with np.errstate(divide='ignore'):
+        return np.maximum(ratio, 1 / ratio)
+
+# Pattern 4 (Complete System Disconnect) needs both ratios outside a band:
+# demo/enrol outside 0.2–5 and bio/demo outside 0.5–2. Both bands are
+# symmetric around 1, so each is one band_factor cut-off (5 and 2). The
+# bio/demo band is held at 2: only the districts outside it are swept.
+disconnect_candidates = district_integrity.assign(
+    demo_band=band_factor(district_integrity['demo_ratio']),
+    bio_demo_band=band_factor(district_integrity['bio_demo_ratio']),
+)
+disconnect_candidates = disconnect_candidates[disconnect_candidates['bio_demo_band'] > 2]
+
+# name -> (table, x, x_op, x grid, y, y_op, y grid, baseline, outside)
+COUNT_GRID = np.unique(np.round(np.geomspace(10, 20000, 80)))
+SWEEPS = {
+    'Ghost districts': (
+        district_integrity, 'enrollments', '>', COUNT_GRID,
+        'demo_ratio', '<', np.round(np.linspace(0.01, 1.0, 100), 2), (GHOST_MIN_ENROLLMENTS, GHOST_MAX_DEMO_RATIO), False,
+    ),
+    'Ghost enrollments (Pattern 1)': (
+        district_integrity, 'enrollments', '>', COUNT_GRID,
+        'demo_ratio', '<', np.round(np.linspace(0.01, 1.0, 100), 2), (1000, 0.3), False,
+    ),
+    'Phantom updates (Pattern 2)': (
+        district_integrity, 'demographic_updates', '>', COUNT_GRID,
+        'demo_ratio', '>', np.round(np.linspace(1, 30, 59), 1), (1000, 10), False,
+    ),
+    'Complete disconnect (Pattern 4)': (
+        disconnect_candidates, 'total_activity', '>', COUNT_GRID,
+        'demo_band', '>', np.round(np.linspace(1.5, 15, 55), 2), (5000, 5.0), False,
+    ),
+    # Scorecard categories: CRITICAL below the low cut, STAGNANT above the high one
+    'Scorecard band (CRITICAL / STAGNANT)': (
+        district_integrity, 'demo_ratio', '>=', np.round(np.linspace(0.05, 1.0, 96), 2),
+        'demo_ratio', '<=', np.round(np.linspace(1.5, 15, 55), 2), (0.2, 5.0), True,
+    ),
+}
+
+threshold_sweeps = {}
+for name, (table, x, x_op, x_grid, y, y_op, y_grid, baseline, outside) in SWEEPS.items():
+    sweep = threshold_sweep(table, x, x_op, x_grid, y, y_op, y_grid, baseline, outside)
+    threshold_sweeps[name] = sweep
+
+    tx, ty = sweep.columns[:2]
+    chosen = sweep[(sweep[tx] == baseline[0]) & (sweep[ty] == baseline[1])].iloc[0]
+    close = sweep[sweep['jaccard'] >= 0.8]
+    rule = f"not ({x} {x_op} t1 and {y} {y_op} t2)" if outside else f"{x} {x_op} t1 and {y} {y_op} t2"
+    print(f"📐 {name}: {rule} — {len(sweep):,} combinations over {len(table):,} districts")
+    print(f"   Chosen ({baseline[0]}, {baseline[1]}): {chosen['flagged']:,.0f} flagged, "
+          f"neighbour stability {chosen['stability']:.2f}")
+    print(f"   Flagged across the grid: {sweep['flagged'].min():,} to {sweep['flagged'].max():,}")
+    print(f"   Combinations within Jaccard ≥ 0.8 of the chosen set: {len(close):,} "
+          f"(t1 {close[tx].min():g}–{close[tx].max():g}, t2 {close[ty].min():g}–{close[ty].max():g})\n")
+
+# Ghost-district sweep: flagged count and similarity to the chosen set
+ghost_sweep = threshold_sweeps['Ghost districts']
+fig, axes = plt.subplots(1, 2, figsize=(18, 6))
+for ax, col, title, cmap in (
+    (axes[0], 'flagged', 'Ghost Districts Flagged', 'Reds'),
+    (axes[1], 'jaccard', 'Jaccard Similarity to Chosen Set', 'viridis'),
+):
+    grid = ghost_sweep.pivot(index='demo_ratio <', columns='enrollments >', values=col)
+    image = ax.pcolormesh(grid.columns, grid.index, grid.to_numpy(), cmap=cmap, shading='auto')
+    ax.scatter(*ghost_sweep.attrs['baseline'], color='black', marker='x', s=120, label='Chosen thresholds')
+    ax.set_xscale('log')
+    ax.set_xlabel('Enrollments >', fontweight='bold')
+    ax.set_ylabel('Demo/Enrol ratio <', fontweight='bold')
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.legend()
+    plt.colorbar(image, ax=ax)
+plt.tight_layout()
+plt.savefig('threshold_sweep.png', dpi=300, bbox_inches='tight')
+plt.show()
+
+print("="*70)